@@ -1,21 +1,17 @@
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 from alembic import context
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-from database import Base, Employee, Student
+from config import DB_URL
+from database import Base
 
 config = context.config
 
-config.set_main_option(
-	"sqlalchemy.url",
-	f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
+config.set_main_option("sqlalchemy.url", DB_URL)
 
-fileConfig(config.config_file_name)
+# The bot runs migrations in-process (database.run_migrations) and keeps its own logging
+if config.attributes.get("configure_logger", True):
+	fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
@@ -34,6 +30,13 @@ def run_migrations_offline():
 
 
 def run_migrations_online():
+	connection = config.attributes.get("connection")
+	if connection is not None:
+		context.configure(connection=connection, target_metadata=target_metadata)
+		with context.begin_transaction():
+			context.run_migrations()
+		return
+
 	connectable = engine_from_config(
 		config.get_section(config.config_ini_section),
 		prefix="sqlalchemy.",
@@ -0,0 +1,79 @@
+"""Baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+language = sa.Enum("UZBEK", "RUSSIAN", name="language")
+institution_type = sa.Enum("BOGCHA_MAKTAB", "MARKAZ", name="institutiontype")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created before migrations existed already have these tables (Base.metadata.create_all)
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "employees" not in existing:
+        op.create_table(
+            "employees",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("date_of_birth", sa.Date(), nullable=False),
+            sa.Column("address", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("position", sa.String(), nullable=False),
+            sa.Column("subject", sa.String(), nullable=True),
+            sa.Column("start_date", sa.Date(), nullable=False),
+            sa.Column("language", language, nullable=False),
+            sa.Column("user_phone", sa.String(), nullable=False),
+            sa.Column("institution_type", institution_type, nullable=False),
+            sa.Column("selfie_url", sa.String(), nullable=True),
+        )
+
+    if "students" not in existing:
+        op.create_table(
+            "students",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("date_of_birth", sa.Date(), nullable=False),
+            sa.Column("age", sa.Integer(), nullable=False),
+            sa.Column("address", sa.String(), nullable=False),
+            sa.Column("diagnosis", sa.String(), nullable=False),
+            sa.Column("attendance_days", sa.String(), nullable=False),
+            sa.Column("parent_name", sa.String(), nullable=False),
+            sa.Column("parent_email", sa.String(), nullable=False),
+            sa.Column("parent_phone", sa.String(), nullable=False),
+            sa.Column("language", language, nullable=False),
+            sa.Column("user_phone", sa.String(), nullable=False),
+            sa.Column("institution_type", institution_type, nullable=False),
+            sa.Column("selfie_url", sa.String(), nullable=True),
+        )
+
+    if "fsm_states" not in existing:
+        op.create_table(
+            "fsm_states",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("value", sa.Text(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("fsm_states")
+    op.drop_table("students")
+    op.drop_table("employees")
+    institution_type.drop(op.get_bind(), checkfirst=True)
+    language.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,74 @@
+"""Respondents table referenced by employees and students
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NORMALIZED_PHONE = "'+' || regexp_replace({column}, '\\D', '', 'g')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "respondents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("phone", sa.String(), nullable=False, unique=True),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("language", postgresql.ENUM(name="language", create_type=False), nullable=False),
+        sa.Column(
+            "institution_type", postgresql.ENUM(name="institutiontype", create_type=False), nullable=False
+        ),
+        sa.Column("selfie_url", sa.String(), nullable=True),
+    )
+    op.create_index("ix_respondents_directory", "respondents", ["id"], postgresql_include=["phone", "full_name"])
+
+    # The latest submission per normalized phone provides the respondent's display fields
+    op.execute(f"""
+        INSERT INTO respondents (phone, full_name, language, institution_type, selfie_url)
+        SELECT DISTINCT ON (phone) phone, full_name, language, institution_type, selfie_url
+        FROM (
+            SELECT {NORMALIZED_PHONE.format(column="user_phone")} AS phone, full_name, language,
+                   institution_type, selfie_url, id
+            FROM employees
+            UNION ALL
+            SELECT {NORMALIZED_PHONE.format(column="user_phone")} AS phone, full_name, language,
+                   institution_type, selfie_url, id
+            FROM students
+        ) AS submissions
+        ORDER BY phone, id DESC
+    """)
+
+    for table in ("employees", "students"):
+        op.add_column(table, sa.Column("respondent_id", sa.Integer(), nullable=True))
+        op.execute(f"""
+            UPDATE {table} SET respondent_id = respondents.id
+            FROM respondents
+            WHERE respondents.phone = {NORMALIZED_PHONE.format(column=f"{table}.user_phone")}
+        """)
+        op.alter_column(table, "respondent_id", nullable=False)
+        op.create_foreign_key(f"{table}_respondent_id_fkey", table, "respondents", ["respondent_id"], ["id"])
+        op.create_index(f"ix_{table}_respondent_id", table, ["respondent_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("employees", "students"):
+        op.drop_index(f"ix_{table}_respondent_id", table_name=table)
+        op.drop_constraint(f"{table}_respondent_id_fkey", table, type_="foreignkey")
+        op.drop_column(table, "respondent_id")
+    op.drop_index("ix_respondents_directory", table_name="respondents")
+    op.drop_table("respondents")
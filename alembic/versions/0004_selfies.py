@@ -0,0 +1,51 @@
+"""Ingested selfies and file ids instead of token-bearing selfie URLs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "selfies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("file_unique_id", sa.String(), nullable=False, unique=True),
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.Column("sha256", sa.String(64), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column("thumb_path", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_selfies_sha256", "selfies", ["sha256"])
+
+    # selfie_url was https://api.telegram.org/file/bot<TOKEN>/<file_id>; keep only the file_id
+    for table in ("respondents", "employees", "students"):
+        op.add_column(table, sa.Column("selfie_file_id", sa.String(), nullable=True))
+        op.add_column(table, sa.Column("selfie_unique_id", sa.String(), nullable=True))
+        op.execute(f"UPDATE {table} SET selfie_file_id = regexp_replace(selfie_url, '^.*/', '') WHERE selfie_url IS NOT NULL")
+        op.drop_column(table, "selfie_url")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("respondents", "employees", "students"):
+        op.add_column(table, sa.Column("selfie_url", sa.String(), nullable=True))
+        op.execute(f"UPDATE {table} SET selfie_url = selfie_file_id")
+        op.drop_column(table, "selfie_unique_id")
+        op.drop_column(table, "selfie_file_id")
+    op.drop_index("ix_selfies_sha256", table_name="selfies")
+    op.drop_table("selfies")
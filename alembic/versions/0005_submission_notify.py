@@ -0,0 +1,50 @@
+"""Notify listeners about new employee and student submissions
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANNEL = "submissions"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_submission() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object(
+                'table', TG_TABLE_NAME,
+                'id', NEW.id,
+                'full_name', left(NEW.full_name, 200),
+                'institution_type', NEW.institution_type,
+                'language', NEW.language
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ("employees", "students"):
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_submission
+            AFTER INSERT ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_submission()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("employees", "students"):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_submission ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_submission()")
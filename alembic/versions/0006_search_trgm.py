@@ -0,0 +1,56 @@
+"""Trigram indexes for the admin /find search
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match search.digits() exactly for the planner to use the phone indexes
+DIGITS = "regexp_replace({column}, '\\D', '', 'g')"
+
+INDEXES = {
+    "employees": {
+        "full_name": "full_name",
+        "email": "email",
+        "user_phone_digits": DIGITS.format(column="user_phone"),
+    },
+    "students": {
+        "full_name": "full_name",
+        "parent_name": "parent_name",
+        "parent_email": "parent_email",
+        "user_phone_digits": DIGITS.format(column="user_phone"),
+        "parent_phone_digits": DIGITS.format(column="parent_phone"),
+    },
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Built concurrently so large tables keep accepting submissions meanwhile
+    with op.get_context().autocommit_block():
+        for table, indexes in INDEXES.items():
+            for name, expression in indexes.items():
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{name}_trgm "
+                    f"ON {table} USING gin (({expression}) gin_trgm_ops)"
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table, indexes in INDEXES.items():
+            for name in indexes:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{name}_trgm")
@@ -0,0 +1,50 @@
+"""Submission statistics rollup table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same buckets as stats.AGE_BUCKETS
+AGE_BUCKET = (
+    "CASE WHEN age <= 3 THEN '0-3' WHEN age <= 6 THEN '4-6' WHEN age <= 10 THEN '7-10' "
+    "WHEN age <= 14 THEN '11-14' ELSE '15+' END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "submission_stats",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("survey", sa.String(16), primary_key=True),
+        sa.Column("institution_type", sa.String(32), primary_key=True),
+        sa.Column("language", sa.String(16), primary_key=True),
+        sa.Column("age_bucket", sa.String(8), primary_key=True, server_default=""),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    for table, survey, age_bucket in (("employees", "employee", "''"), ("students", "student", AGE_BUCKET)):
+        op.execute(f"""
+            INSERT INTO submission_stats (day, survey, institution_type, language, age_bucket, count)
+            SELECT (created_at AT TIME ZONE 'UTC')::date, '{survey}', institution_type::text, language::text,
+                   {age_bucket}, count(*)
+            FROM {table}
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("submission_stats")
@@ -0,0 +1,83 @@
+"""Merge duplicate submissions and make (phone, name, birth date) unique
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+IDENTITY = "user_phone, full_name, date_of_birth"
+# Same buckets as stats.AGE_BUCKETS
+AGE_BUCKET = (
+    "CASE WHEN age <= 3 THEN '0-3' WHEN age <= 6 THEN '4-6' WHEN age <= 10 THEN '7-10' "
+    "WHEN age <= 14 THEN '11-14' ELSE '15+' END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("employees", "students"):
+        # Rows written before normalization may hold the phone as Telegram sent it. This keeps every
+        # digit, so a 00 prefix survives as '+00…'; 0010 brings these in line with normalize_phone
+        op.execute(f"""
+            UPDATE {table} SET user_phone = '+' || regexp_replace(user_phone, '\\D', '', 'g')
+            WHERE user_phone !~ '^\\+[0-9]+$'
+        """)
+        # The newest row of each group survives with the first submission time and the newest selfie
+        op.execute(f"""
+            WITH ranked AS (
+                SELECT id,
+                       first_value(id) OVER latest AS keep_id,
+                       min(created_at) OVER latest AS first_created_at,
+                       first_value(selfie_file_id) OVER selfie AS selfie_file_id,
+                       first_value(selfie_unique_id) OVER selfie AS selfie_unique_id
+                FROM {table}
+                WINDOW latest AS (PARTITION BY {IDENTITY} ORDER BY id DESC
+                                  ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING),
+                       selfie AS (PARTITION BY {IDENTITY} ORDER BY selfie_file_id IS NULL, id DESC
+                                  ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            ),
+            merged AS (
+                UPDATE {table} AS t
+                SET created_at = r.first_created_at,
+                    selfie_file_id = r.selfie_file_id,
+                    selfie_unique_id = r.selfie_unique_id
+                FROM ranked AS r
+                WHERE t.id = r.id AND r.id = r.keep_id
+                  AND EXISTS (SELECT 1 FROM ranked AS d WHERE d.keep_id = r.id AND d.id <> r.id)
+            )
+            DELETE FROM {table} AS t
+            USING ranked AS r
+            WHERE t.id = r.id AND r.id <> r.keep_id
+        """)
+        op.create_unique_constraint(
+            f"uq_{table}_submission", table, ["user_phone", "full_name", "date_of_birth"]
+        )
+
+    # Counts in the rollup included the merged duplicates
+    op.execute("DELETE FROM submission_stats")
+    for table, survey, age_bucket in (("employees", "employee", "''"), ("students", "student", AGE_BUCKET)):
+        op.execute(f"""
+            INSERT INTO submission_stats (day, survey, institution_type, language, age_bucket, count)
+            SELECT (created_at AT TIME ZONE 'UTC')::date, '{survey}', institution_type::text, language::text,
+                   {age_bucket}, count(*)
+            FROM {table}
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Merged duplicates and the original phone formatting are not restored
+    for table in ("employees", "students"):
+        op.drop_constraint(f"uq_{table}_submission", table, type_="unique")
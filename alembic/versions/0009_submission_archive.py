@@ -0,0 +1,50 @@
+"""Submission updated_at, BRIN indexes on created_at and the archive table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("employees", "students"):
+        op.add_column(
+            table,
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+        # Rows are append-only in created_at order, so a BRIN index stays tiny and prunes date ranges
+        op.create_index(f"ix_{table}_created_at", table, ["created_at"], postgresql_using="brin")
+
+    op.create_table(
+        "submission_archive",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("survey_table", sa.String(16), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("archived_before", sa.Date(), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("rows", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("submission_archive")
+    for table in ("employees", "students"):
+        op.drop_index(f"ix_{table}_created_at", table_name=table)
+        op.drop_column(table, "updated_at")
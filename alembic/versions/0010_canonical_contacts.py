@@ -0,0 +1,139 @@
+"""Canonical phones and e-mail domains
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+IDENTITY = "user_phone, full_name, date_of_birth"
+# Same buckets as stats.AGE_BUCKETS
+AGE_BUCKET = (
+    "CASE WHEN age <= 3 THEN '0-3' WHEN age <= 6 THEN '4-6' WHEN age <= 10 THEN '7-10' "
+    "WHEN age <= 14 THEN '11-14' ELSE '15+' END"
+)
+CANONICAL_EMAIL = "split_part({column}, '@', 1) || '@' || lower(split_part({column}, '@', 2))"
+# Rows from before this revision were archived with their counts already in the rollup
+NOT_ARCHIVED = "coalesce((SELECT max(archived_before) FROM submission_archive), '-infinity'::date)"
+
+
+def canonical_phone(value, column):
+    """SQL for validators.normalize_phone(value); ``column`` is kept where normalize_phone rejects the value."""
+    digits = f"regexp_replace({value}, '[\\s().-]', '', 'g')"
+    return (
+        f"CASE WHEN {digits} ~ '^(\\+|00)?[1-9][0-9]{{9,14}}$' "
+        f"THEN '+' || regexp_replace({digits}, '^(\\+|00)', '') ELSE {column} END"
+    )
+
+
+def canonical_stored_phone(column):
+    """Canonical form of a phone stored by the old normalization, '+' followed by every digit typed.
+
+    A number typed with the 00 prefix was stored as '+00…'; it becomes '+…' like
+    normalize_phone now makes it. Numbers it would reject, such as a leading 0, are kept
+    as they are and reported by tools/recheck_contacts.py.
+    """
+    return canonical_phone(f"regexp_replace({column}, '^\\+', '')", column)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    phone = canonical_phone("parent_phone", "parent_phone")
+    op.execute(f"UPDATE students SET parent_phone = {phone} WHERE parent_phone IS DISTINCT FROM {phone}")
+    for table, column in (("employees", "email"), ("students", "parent_email")):
+        email = CANONICAL_EMAIL.format(column=column)
+        op.execute(f"UPDATE {table} SET {column} = {email} WHERE strpos({column}, '@') > 0 AND {column} <> {email}")
+
+    # Respondents whose phones become equal are merged into the newest one
+    op.execute(f"""
+        CREATE TEMPORARY TABLE respondent_merge ON COMMIT DROP AS
+        SELECT id, phone, first_value(id) OVER (PARTITION BY phone ORDER BY id DESC) AS keep_id
+        FROM (SELECT id, {canonical_stored_phone("phone")} AS phone FROM respondents) AS canonical
+    """)
+    for table in ("employees", "students"):
+        op.execute(f"""
+            UPDATE {table} SET respondent_id = m.keep_id
+            FROM respondent_merge AS m
+            WHERE {table}.respondent_id = m.id AND m.id <> m.keep_id
+        """)
+    op.execute("""
+        UPDATE respondents AS r
+        SET selfie_file_id = s.selfie_file_id, selfie_unique_id = s.selfie_unique_id
+        FROM (
+            SELECT DISTINCT ON (m.keep_id) m.keep_id, d.selfie_file_id, d.selfie_unique_id
+            FROM respondent_merge AS m JOIN respondents AS d ON d.id = m.id
+            WHERE d.selfie_file_id IS NOT NULL
+            ORDER BY m.keep_id, m.id DESC
+        ) AS s
+        WHERE r.id = s.keep_id AND r.selfie_file_id IS NULL
+    """)
+    op.execute("DELETE FROM respondents USING respondent_merge AS m WHERE respondents.id = m.id AND m.id <> m.keep_id")
+    op.execute("""
+        UPDATE respondents SET phone = m.phone
+        FROM respondent_merge AS m
+        WHERE respondents.id = m.id AND respondents.phone <> m.phone
+    """)
+
+    for table in ("employees", "students"):
+        # Canonical phones can make two rows one submission, so the constraint waits for the merge
+        op.drop_constraint(f"uq_{table}_submission", table, type_="unique")
+        phone = canonical_stored_phone("user_phone")
+        op.execute(f"UPDATE {table} SET user_phone = {phone} WHERE user_phone <> {phone}")
+        # Same merge as 0008: the newest row survives with the first submission time and the newest selfie
+        op.execute(f"""
+            WITH ranked AS (
+                SELECT id,
+                       first_value(id) OVER latest AS keep_id,
+                       min(created_at) OVER latest AS first_created_at,
+                       first_value(selfie_file_id) OVER selfie AS selfie_file_id,
+                       first_value(selfie_unique_id) OVER selfie AS selfie_unique_id
+                FROM {table}
+                WINDOW latest AS (PARTITION BY {IDENTITY} ORDER BY id DESC
+                                  ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING),
+                       selfie AS (PARTITION BY {IDENTITY} ORDER BY selfie_file_id IS NULL, id DESC
+                                  ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            ),
+            merged AS (
+                UPDATE {table} AS t
+                SET created_at = r.first_created_at,
+                    selfie_file_id = r.selfie_file_id,
+                    selfie_unique_id = r.selfie_unique_id
+                FROM ranked AS r
+                WHERE t.id = r.id AND r.id = r.keep_id
+                  AND EXISTS (SELECT 1 FROM ranked AS d WHERE d.keep_id = r.id AND d.id <> r.id)
+            )
+            DELETE FROM {table} AS t
+            USING ranked AS r
+            WHERE t.id = r.id AND r.id <> r.keep_id
+        """)
+        op.create_unique_constraint(
+            f"uq_{table}_submission", table, ["user_phone", "full_name", "date_of_birth"]
+        )
+
+    # Counts of the days still in the submission tables included the merged duplicates
+    op.execute(f"DELETE FROM submission_stats WHERE day >= {NOT_ARCHIVED}")
+    for table, survey, age_bucket in (("employees", "employee", "''"), ("students", "student", AGE_BUCKET)):
+        op.execute(f"""
+            INSERT INTO submission_stats (day, survey, institution_type, language, age_bucket, count)
+            SELECT (created_at AT TIME ZONE 'UTC')::date, '{survey}', institution_type::text, language::text,
+                   {age_bucket}, count(*)
+            FROM {table}
+            WHERE created_at >= {NOT_ARCHIVED}::timestamp AT TIME ZONE 'UTC'
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The values as typed and the merged duplicates are not restored
+    pass
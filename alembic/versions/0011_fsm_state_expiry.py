@@ -0,0 +1,34 @@
+"""Record when FSM states were last written so FSM_STATE_TTL can expire them
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing states count as written now, so they get a full TTL rather than expiring at once
+    op.add_column(
+        "fsm_states",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_fsm_states_updated_at", "fsm_states", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_fsm_states_updated_at", table_name="fsm_states")
+    op.drop_column("fsm_states", "updated_at")
@@ -0,0 +1,40 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import select, func, delete, insert, literal, Date
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from database import Employee, Student, SubmissionArchive
+
+
+def archive_cutoff(months, today=None):
+	"""First day of the calendar month ``months`` months before the current (UTC) one."""
+	today = today or datetime.now(timezone.utc).date()
+	index = today.year * 12 + today.month - 1 - months
+	return date(index // 12, index % 12 + 1, 1)
+
+
+async def archive_submissions(session, before):
+	"""Move employees and students created before ``before`` into submission_archive, one entry per month.
+
+	Returns ``{table: rows moved}``. The statistics rollup keeps counting archived rows.
+	"""
+	cutoff = datetime.combine(before, datetime.min.time(), timezone.utc)
+	moved = {}
+	for model in (Employee, Student):
+		table = model.__table__
+		month = func.date_trunc("month", func.timezone("UTC", model.created_at)).cast(Date)
+		await session.execute(insert(SubmissionArchive).from_select(
+			["survey_table", "month", "archived_before", "row_count", "rows"],
+			select(
+				literal(table.name), month, literal(before), func.count(),
+				func.jsonb_agg(aggregate_order_by(func.to_jsonb(table.table_valued()), model.id)),
+			).where(model.created_at < cutoff).group_by(month),
+		))
+		result = await session.execute(delete(model).where(model.created_at < cutoff))
+		moved[table.name] = result.rowcount
+	return moved
+
+
+async def archived_before(session):
+	"""Date before which submissions live only in the archive, or None if nothing was archived."""
+	return (await session.execute(select(func.max(SubmissionArchive.archived_before)))).scalar()
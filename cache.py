@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+	"""Bounded LRU cache whose entries also expire ``ttl`` seconds after being set."""
+
+	def __init__(self, maxsize=1024, ttl=300.0):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._entries = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key, default=None):
+		entry = self._entries.get(key, _MISSING)
+		if entry is _MISSING or entry[0] < time.monotonic():
+			if entry is not _MISSING:
+				del self._entries[key]
+			self.misses += 1
+			return default
+		self._entries.move_to_end(key)
+		self.hits += 1
+		return entry[1]
+
+	def set(self, key, value):
+		self._entries[key] = (time.monotonic() + self.ttl, value)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.maxsize:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def pop(self, key):
+		self._entries.pop(key, None)
+
+	def clear(self):
+		self._entries.clear()
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			"size": len(self._entries),
+			"maxsize": self.maxsize,
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit_rate": self.hits / lookups if lookups else 0.0,
+		}
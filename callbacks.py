@@ -0,0 +1,16 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class RespondentsPage(CallbackData, prefix="rp"):
+	cursor: int = 0
+	back: bool = False
+
+
+class RespondentPick(CallbackData, prefix="ru"):
+	id: int
+
+
+class FindPage(CallbackData, prefix="fp"):
+	# Queries can exceed the 64-byte callback limit, so pages refer to them by token
+	token: int
+	offset: int = 0
@@ -0,0 +1,94 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_NAME = os.getenv("DB_NAME")
+
+DB_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DB_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Startup: seconds to wait for the database, and whether the bot applies Alembic migrations itself
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", 60))
+DB_MIGRATE_ON_START = os.getenv("DB_MIGRATE_ON_START", "1") == "1"
+
+# Connection pool of the async engine used by the bot handlers
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# Write-behind queue for completed surveys
+SUBMISSION_BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", 100))
+SUBMISSION_FLUSH_INTERVAL = float(os.getenv("SUBMISSION_FLUSH_INTERVAL", 2.0))
+SUBMISSION_SPILL_PATH = os.getenv("SUBMISSION_SPILL_PATH", "data/submissions.spill.jsonl")
+
+# FSM storage backend: memory, redis, postgres (fsm_states table on the main database) or sqlite (local stand-in)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", "data/fsm.sqlite3")
+# Seconds after the last write at which an unfinished survey is forgotten (redis, postgres and sqlite backends)
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL")) if os.getenv("FSM_STATE_TTL") else None
+
+# Submissions older than this many calendar months are moved to submission_archive by tools/archive_submissions.py
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", 12))
+
+# Admin respondent browser
+RESPONDENTS_PAGE_SIZE = int(os.getenv("RESPONDENTS_PAGE_SIZE", 20))
+
+# In-process cache for the admin respondent directory and detail views
+ADMIN_CACHE_SIZE = int(os.getenv("ADMIN_CACHE_SIZE", 1024))
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", 300))
+
+# Selfie ingestion: content-addressed originals and thumbnails
+SELFIE_DIR = os.getenv("SELFIE_DIR", "data/selfies")
+SELFIE_WORKERS = int(os.getenv("SELFIE_WORKERS", 4))
+SELFIE_THUMB_SIZE = int(os.getenv("SELFIE_THUMB_SIZE", 320))
+
+# Update delivery: "polling" (default) or "webhook"
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Public base URL registered with Telegram; leave empty to serve locally without calling setWebhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", 100))
+
+# Scale-out: with BOT_WORKERS > 0 this process only receives updates (RUN_MODE) and hands them to that many
+# worker processes, sharded by chat id; the receiver sets BOT_WORKER_INDEX for each worker it starts
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 0))
+BOT_WORKER_INDEX = int(os.getenv("BOT_WORKER_INDEX")) if os.getenv("BOT_WORKER_INDEX") else None
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", 1000))
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", 2))
+WORKER_HEARTBEAT_TIMEOUT = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", 15))
+
+# Per-user throttling (events per second and burst size)
+THROTTLE_MESSAGE_RATE = float(os.getenv("THROTTLE_MESSAGE_RATE", 1.0))
+THROTTLE_MESSAGE_BURST = int(os.getenv("THROTTLE_MESSAGE_BURST", 5))
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", 2.0))
+THROTTLE_CALLBACK_BURST = int(os.getenv("THROTTLE_CALLBACK_BURST", 5))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", 10000))
+THROTTLE_IDLE_TTL = float(os.getenv("THROTTLE_IDLE_TTL", 600))
+
+# Outbound Bot API pacing (calls per second) and 429 retries
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", 30))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", 1))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", 3))
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", 20 / 60))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", 3))
+
+# Admin digest of new submissions (LISTEN/NOTIFY); set DIGEST_INTERVAL to 0 to disable
+DIGEST_INTERVAL = float(os.getenv("DIGEST_INTERVAL", 300))
+DIGEST_LATEST = int(os.getenv("DIGEST_LATEST", 5))
+
+# Prometheus metrics endpoint (/metrics); set METRICS_PORT to 0 to disable
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9000))
+
+# Bot API server; empty for api.telegram.org (set to a local Bot API server or the load-test stand-in)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
@@ -1,14 +1,20 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, Enum
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Enum, Text, ForeignKey, Index, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import enum
-from dotenv import load_dotenv
+import functools
+import logging
 import os
+from config import DB_URL, ASYNC_DB_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, \
+	DB_READY_TIMEOUT
+from validators import normalize_phone
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-DB_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-engine = create_engine(DB_URL)
 Base = declarative_base()
 
 
@@ -22,6 +28,33 @@ class InstitutionType(enum.Enum):
 	MARKAZ = "markaz"
 
 
+class Selfie(Base):
+	__tablename__ = "selfies"
+	id = Column(Integer, primary_key=True)
+	file_unique_id = Column(String, nullable=False, unique=True)
+	file_id = Column(String, nullable=False)
+	sha256 = Column(String(64), nullable=False, index=True)
+	path = Column(String, nullable=False)
+	thumb_path = Column(String, nullable=False)
+	created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class Respondent(Base):
+	__tablename__ = "respondents"
+	id = Column(Integer, primary_key=True)
+	phone = Column(String, nullable=False, unique=True)
+	full_name = Column(String, nullable=False)
+	language = Column(Enum(Language), nullable=False)
+	institution_type = Column(Enum(InstitutionType), nullable=False)
+	selfie_file_id = Column(String, nullable=True)
+	selfie_unique_id = Column(String, nullable=True)
+
+	# Covers the admin directory (keyset on id) so pages are served by index-only scans
+	__table_args__ = (
+		Index("ix_respondents_directory", "id", postgresql_include=["phone", "full_name"]),
+	)
+
+
 class Employee(Base):
 	__tablename__ = "employees"
 	id = Column(Integer, primary_key=True)
@@ -35,7 +68,17 @@ class Employee(Base):
 	language = Column(Enum(Language), nullable=False)
 	user_phone = Column(String, nullable=False)
 	institution_type = Column(Enum(InstitutionType), nullable=False)
-	selfie_url = Column(String, nullable=True)
+	selfie_file_id = Column(String, nullable=True)
+	selfie_unique_id = Column(String, nullable=True)
+	respondent_id = Column(Integer, ForeignKey("respondents.id"), nullable=False, index=True)
+	created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+	updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+	# user_phone is stored normalized (see normalize_phone); resubmissions update the row in place
+	__table_args__ = (
+		UniqueConstraint("user_phone", "full_name", "date_of_birth", name="uq_employees_submission"),
+		Index("ix_employees_created_at", "created_at", postgresql_using="brin"),
+	)
 
 
 class Student(Base):
@@ -53,8 +96,121 @@ class Student(Base):
 	language = Column(Enum(Language), nullable=False)
 	user_phone = Column(String, nullable=False)
 	institution_type = Column(Enum(InstitutionType), nullable=False)
-	selfie_url = Column(String, nullable=True)
+	selfie_file_id = Column(String, nullable=True)
+	selfie_unique_id = Column(String, nullable=True)
+	respondent_id = Column(Integer, ForeignKey("respondents.id"), nullable=False, index=True)
+	created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+	updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+	# Same submission identity as employees
+	__table_args__ = (
+		UniqueConstraint("user_phone", "full_name", "date_of_birth", name="uq_students_submission"),
+		Index("ix_students_created_at", "created_at", postgresql_using="brin"),
+	)
+
+
+class SubmissionStats(Base):
+	"""Submission counts per day and dimension, kept up to date by the submission flusher (see stats.py)."""
+	__tablename__ = "submission_stats"
+	day = Column(Date, primary_key=True)
+	survey = Column(String(16), primary_key=True)
+	institution_type = Column(String(32), primary_key=True)
+	language = Column(String(16), primary_key=True)
+	# Student age bucket; empty for employees
+	age_bucket = Column(String(8), primary_key=True, server_default="")
+	count = Column(Integer, nullable=False, server_default="0")
+
+
+class SubmissionArchive(Base):
+	"""One calendar month of archived submissions of one table (see archive.py)."""
+	__tablename__ = "submission_archive"
+	id = Column(Integer, primary_key=True)
+	survey_table = Column(String(16), nullable=False)
+	month = Column(Date, nullable=False)
+	# Rows created before this (UTC) date had been archived when this entry was written
+	archived_before = Column(Date, nullable=False)
+	row_count = Column(Integer, nullable=False)
+	# All rows of the month as one JSON array, so TOAST compresses it as a single value
+	rows = Column(JSONB, nullable=False)
+	created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class FsmRecord(Base):
+	__tablename__ = "fsm_states"
+	key = Column(String, primary_key=True)
+	value = Column(Text, nullable=False)
+	# Last write; FSM_STATE_TTL expires records by it
+	updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+# Engines are built on first use: importing the models opens no connection and loads no driver
+@functools.cache
+def get_engine():
+	return create_engine(DB_URL)
+
+
+@functools.cache
+def get_async_engine():
+	return create_async_engine(
+		ASYNC_DB_URL,
+		pool_size=DB_POOL_SIZE,
+		max_overflow=DB_MAX_OVERFLOW,
+		pool_timeout=DB_POOL_TIMEOUT,
+		pool_recycle=DB_POOL_RECYCLE,
+		pool_pre_ping=True,
+	)
+
+
+_LAZY = {
+	"engine": get_engine,
+	"async_engine": get_async_engine,
+	"SessionLocal": lambda: sessionmaker(bind=get_engine()),
+	"AsyncSessionLocal": lambda: async_sessionmaker(get_async_engine(), expire_on_commit=False),
+}
+
+
+def __getattr__(name):
+	if name not in _LAZY:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = globals()[name] = _LAZY[name]()
+	return value
+
+
+async def wait_for_database(timeout=DB_READY_TIMEOUT, initial_delay=0.1, max_delay=2.0):
+	"""Retry ``SELECT 1`` with exponential backoff until the database answers; raises after ``timeout`` seconds."""
+	loop = asyncio.get_running_loop()
+	deadline = loop.time() + timeout
+	delay = initial_delay
+	while True:
+		try:
+			async with get_async_engine().connect() as conn:
+				await conn.execute(text("SELECT 1"))
+			return
+		except (OSError, DBAPIError) as e:
+			remaining = deadline - loop.time()
+			if remaining <= 0:
+				raise
+			logger.info(f"Database not ready, retrying in {min(delay, remaining):.1f}s: {str(e)}")
+			await asyncio.sleep(min(delay, remaining))
+			delay = min(delay * 2, max_delay)
+
+
+def _upgrade(connection, config):
+	from alembic import command
+
+	config.attributes["connection"] = connection
+	command.upgrade(config, "head")
+
 
+async def run_migrations():
+	"""Apply pending Alembic migrations over the async engine."""
+	from alembic.config import Config
 
-Base.metadata.create_all(engine)
-SessionLocal = sessionmaker(bind=engine)
+	root = os.path.dirname(os.path.abspath(__file__))
+	config = Config(os.path.join(root, "alembic.ini"))
+	config.set_main_option("script_location", os.path.join(root, "alembic"))
+	# Keep the bot's logging setup; alembic.ini would replace it
+	config.attributes["configure_logger"] = False
+	async with get_async_engine().connect() as conn:
+		await conn.run_sync(_upgrade, config)
+		await conn.commit()
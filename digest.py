@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+from collections import Counter, deque
+from contextlib import suppress
+
+import asyncpg
+
+from database import InstitutionType, Language
+
+logger = logging.getLogger(__name__)
+
+TABLE_LABELS = {
+	"employees": "Xodimlar / Сотрудники",
+	"students": "Tarbiyalanuvchilar / Воспитанники",
+}
+
+
+def _enum_value(enum_class, name):
+	# Enum columns are stored by member name, e.g. "BOGCHA_MAKTAB".
+	return enum_class[name].value if name in enum_class.__members__ else str(name)
+
+
+class SubmissionDigest:
+	"""Sends the admin a periodic summary of new submissions.
+
+	Inserts into ``employees``/``students`` raise a NOTIFY on ``channel`` (migration
+	0005); one dedicated connection LISTENs for them and the events are counted in
+	memory until the next digest, sent every ``interval`` seconds when there is
+	anything new. The connection is re-established after ``reconnect_delay`` seconds
+	if it drops; notifications raised while it is down are not replayed.
+	"""
+
+	def __init__(self, bot, dsn, chat_id, interval=300.0, latest=5, channel="submissions", reconnect_delay=5.0):
+		self._bot = bot
+		self._dsn = dsn
+		self._chat_id = chat_id
+		self._interval = interval
+		self._channel = channel
+		self._reconnect_delay = reconnect_delay
+		self._total = 0
+		self._tables = Counter()
+		self._institutions = Counter()
+		self._languages = Counter()
+		self._latest = deque(maxlen=latest)
+		self._tasks = []
+
+	async def start(self):
+		self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._send_periodically())]
+
+	async def stop(self):
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+		await self.flush()
+
+	async def _listen(self):
+		while True:
+			lost = asyncio.Event()
+			conn = None
+			try:
+				conn = await asyncpg.connect(self._dsn)
+				conn.add_termination_listener(lambda _: lost.set())
+				await conn.add_listener(self._channel, self._on_notify)
+				logger.info(f"Listening for submissions on channel {self._channel}")
+				await lost.wait()
+				logger.warning(f"Submission digest connection lost, reconnecting in {self._reconnect_delay}s")
+			except Exception as e:
+				# Cancellation is not an Exception, so stopping the digest still ends the loop
+				logger.warning(f"Submission digest cannot listen, retrying in {self._reconnect_delay}s: {str(e)}")
+			finally:
+				if conn is not None:
+					with suppress(Exception):
+						await conn.close(timeout=5)
+			await asyncio.sleep(self._reconnect_delay)
+
+	def _on_notify(self, connection, pid, channel, payload):
+		try:
+			event = json.loads(payload)
+		except ValueError:
+			logger.warning(f"Ignoring malformed submission notification: {payload}")
+			return
+		self._total += 1
+		self._tables[event.get("table")] += 1
+		self._institutions[event.get("institution_type")] += 1
+		self._languages[event.get("language")] += 1
+		self._latest.append(event.get("full_name") or "?")
+
+	async def _send_periodically(self):
+		while True:
+			await asyncio.sleep(self._interval)
+			await self.flush()
+
+	def render(self):
+		lines = [
+			f"Yangi javoblar / Новые ответы: {self._total}",
+			", ".join(f"{TABLE_LABELS.get(table, table)}: {count}" for table, count in self._tables.most_common()),
+			", ".join(
+				f"{_enum_value(InstitutionType, name)}: {count}" for name, count in self._institutions.most_common()
+			),
+			", ".join(f"{_enum_value(Language, name)}: {count}" for name, count in self._languages.most_common()),
+			"Oxirgilar / Последние: " + ", ".join(reversed(self._latest)),
+		]
+		return "\n".join(lines)
+
+	async def flush(self):
+		if not self._total:
+			return
+		text = self.render()
+		self._total = 0
+		self._tables.clear()
+		self._institutions.clear()
+		self._languages.clear()
+		self._latest.clear()
+		try:
+			await self._bot.send_message(self._chat_id, text)
+		except Exception as e:
+			logger.error(f"Failed to send submission digest: {str(e)}")
@@ -0,0 +1,79 @@
+import csv
+import enum
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from database import InstitutionType, Language
+
+FORMATS = ("csv", "jsonl")
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFilters:
+	def __init__(self, institution_type=None, language=None, date_from=None, date_to=None):
+		self.institution_type = institution_type
+		self.language = language
+		self.date_from = date_from
+		self.date_to = date_to
+
+	@classmethod
+	def parse(cls, args):
+		"""Parse ``inst=markaz lang=uz from=2025-01-01 to=2025-01-31`` style arguments."""
+		filters = cls()
+		for arg in args:
+			key, _, value = arg.partition("=")
+			if key == "inst":
+				filters.institution_type = InstitutionType(value)
+			elif key == "lang":
+				filters.language = Language(value)
+			elif key == "from":
+				filters.date_from = date.fromisoformat(value)
+			elif key == "to":
+				filters.date_to = date.fromisoformat(value)
+			else:
+				raise ValueError(f"Unknown export filter: {arg}")
+		return filters
+
+	def apply(self, query, model):
+		if self.institution_type is not None:
+			query = query.where(model.institution_type == self.institution_type)
+		if self.language is not None:
+			query = query.where(model.language == self.language)
+		if self.date_from is not None:
+			query = query.where(model.created_at >= self.date_from)
+		if self.date_to is not None:
+			query = query.where(model.created_at < self.date_to + timedelta(days=1))
+		return query
+
+
+def _plain(value):
+	if isinstance(value, enum.Enum):
+		return value.value
+	if isinstance(value, (date, datetime)):
+		return value.isoformat()
+	return value
+
+
+async def export_table(session_factory, model, fmt, filters, path):
+	"""Stream ``model`` rows matching ``filters`` into a gzip file at ``path``; returns the row count."""
+	columns = [column.name for column in model.__table__.columns]
+	query = filters.apply(select(*model.__table__.columns).order_by(model.id), model)
+	count = 0
+	with gzip.open(path, "wt", encoding="utf-8", newline="") as output:
+		writer = csv.writer(output) if fmt == "csv" else None
+		if writer is not None:
+			writer.writerow(columns)
+		async with session_factory() as session:
+			result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+			async for partition in result.partitions():
+				for row in partition:
+					values = [_plain(value) for value in row]
+					if writer is not None:
+						writer.writerow(values)
+					else:
+						output.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False) + "\n")
+				count += len(partition)
+	return count
@@ -1,4 +1,7 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardMarkup, \
+	InlineKeyboardButton
+
+from callbacks import RespondentsPage, RespondentPick
 
 
 def get_language_keyboard():
@@ -52,3 +55,27 @@ def get_contact_keyboard(lang: str):
 		resize_keyboard=True,
 		one_time_keyboard=True
 	)
+
+
+def get_respondents_keyboard(rows, prev_page=None, next_page=None):
+	keyboard = [
+		[InlineKeyboardButton(
+			text=f"{row.full_name} ({row.phone})",
+			callback_data=RespondentPick(id=row.id).pack()
+		)]
+		for row in rows
+	]
+	navigation = []
+	if prev_page is not None:
+		navigation.append(InlineKeyboardButton(text="⬅️", callback_data=prev_page.pack()))
+	if next_page is not None:
+		navigation.append(InlineKeyboardButton(text="➡️", callback_data=next_page.pack()))
+	if navigation:
+		keyboard.append(navigation)
+	return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_respondent_back_keyboard():
+	return InlineKeyboardMarkup(inline_keyboard=[
+		[InlineKeyboardButton(text="⬅️ Orqaga / Назад", callback_data=RespondentsPage().pack())]
+	])
@@ -1,18 +1,49 @@
 import asyncio
-import re
+import sys
+import zlib
 import logging
+import tempfile
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, KeyboardButton, \
-	ReplyKeyboardMarkup, ContentType
+from aiogram.types import Message, CallbackQuery, KeyboardButton, ReplyKeyboardMarkup, ContentType, FSInputFile, \
+	InputMediaPhoto
 from dotenv import load_dotenv
 import os
-from database import SessionLocal, Employee, Student, Language, InstitutionType
-from states import SurveyTypeForm, EmployeeForm, StudentForm
+from sqlalchemy import select
+import database
+from database import Employee, Student, Respondent, Selfie, Language, InstitutionType, get_async_engine, \
+	wait_for_database, run_migrations
+from config import SUBMISSION_BATCH_SIZE, SUBMISSION_FLUSH_INTERVAL, SUBMISSION_SPILL_PATH, FSM_STORAGE, REDIS_URL, \
+	FSM_SQLITE_PATH, FSM_STATE_TTL, RESPONDENTS_PAGE_SIZE, ADMIN_CACHE_SIZE, ADMIN_CACHE_TTL, SELFIE_DIR, SELFIE_WORKERS, \
+	SELFIE_THUMB_SIZE, RUN_MODE, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET, \
+	WEBHOOK_MAX_IN_FLIGHT, THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST, THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST, \
+	THROTTLE_MAX_USERS, THROTTLE_IDLE_TTL, OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, \
+	OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES, DB_URL, DIGEST_INTERVAL, DIGEST_LATEST, METRICS_HOST, METRICS_PORT, \
+	TELEGRAM_API_URL, DB_READY_TIMEOUT, DB_MIGRATE_ON_START, BOT_WORKERS, BOT_WORKER_INDEX, WORKER_QUEUE_SIZE, WORKER_HEARTBEAT_INTERVAL, \
+	WORKER_HEARTBEAT_TIMEOUT
+from submissions import SubmissionQueue
+from cache import TTLCache
+from export import ExportFilters, FORMATS, export_table
+from search import search_respondents, MIN_QUERY_LENGTH
+from stats import load_stats, render_stats
+from selfies import SelfieIngestor
+from digest import SubmissionDigest
+from webhook import run_webhook
+from workers import WorkerPool, build_receiver, run_worker
+from middlewares import ThrottlingMiddleware, UpdateContextMiddleware
+from outbound import SendScheduler
+from metrics import HandlerMetricsMiddleware, BotApiMetrics, InstrumentedStorage, VALIDATION_FAILURES, \
+	instrument_engine, set_conversations, start_metrics_server
+from storage import build_storage, count_states
+from states import SurveyTypeForm
+from survey import SurveyStep, SURVEY_CHOICES
+from validators import normalize_phone
+from callbacks import RespondentsPage, RespondentPick, FindPage
 from keyboard import get_language_keyboard, get_survey_type_keyboard, get_contact_keyboard, \
-	get_institution_type_keyboard
-from datetime import datetime
+	get_institution_type_keyboard, get_respondents_keyboard, get_respondent_back_keyboard
 
 logging.basicConfig(
 	level=logging.INFO,
@@ -21,20 +52,107 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-bot = Bot(token=os.getenv("BOT_TOKEN"))
-dp = Dispatcher()
+bot = Bot(
+	token=os.getenv("BOT_TOKEN"),
+	session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None,
+)
+storage, events_isolation = build_storage(
+	FSM_STORAGE, redis_url=REDIS_URL, sqlite_path=FSM_SQLITE_PATH, state_ttl=FSM_STATE_TTL
+)
+dp = Dispatcher(storage=InstrumentedStorage(storage), events_isolation=events_isolation)
 ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
+send_scheduler = SendScheduler(
+	global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE, chat_burst=OUTBOUND_CHAT_BURST,
+	group_rate=OUTBOUND_GROUP_RATE, max_retries=OUTBOUND_MAX_RETRIES, bulk_chats={ADMIN_ID}
+)
+bot.session.middleware(send_scheduler)
+bot.session.middleware(BotApiMetrics())
+dp.message.outer_middleware(ThrottlingMiddleware(
+	THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST,
+	max_users=THROTTLE_MAX_USERS, idle_ttl=THROTTLE_IDLE_TTL, exempt={ADMIN_ID}
+))
+dp.callback_query.outer_middleware(ThrottlingMiddleware(
+	THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST,
+	max_users=THROTTLE_MAX_USERS, idle_ttl=THROTTLE_IDLE_TTL, exempt={ADMIN_ID}
+))
+update_context = UpdateContextMiddleware(ADMIN_ID)
+dp.message.outer_middleware(update_context)
+dp.callback_query.outer_middleware(update_context)
+dp.message.middleware(HandlerMetricsMiddleware())
+dp.callback_query.middleware(HandlerMetricsMiddleware())
+directory_cache = TTLCache(maxsize=ADMIN_CACHE_SIZE, ttl=ADMIN_CACHE_TTL)
+detail_cache = TTLCache(maxsize=ADMIN_CACHE_SIZE, ttl=ADMIN_CACHE_TTL)
+search_queries = TTLCache(maxsize=ADMIN_CACHE_SIZE, ttl=ADMIN_CACHE_TTL)
+
+
+def open_session():
+	# The engine is created on first use (see database.py), not when this module is imported
+	return database.AsyncSessionLocal()
+
+
+def invalidate_respondents(respondent_ids):
+	directory_cache.clear()
+	for respondent_id in respondent_ids:
+		detail_cache.pop(respondent_id)
+
+
+submission_queue = SubmissionQueue(
+	open_session,
+	models=(Employee, Student),
+	spill_path=SUBMISSION_SPILL_PATH,
+	batch_size=SUBMISSION_BATCH_SIZE,
+	flush_interval=SUBMISSION_FLUSH_INTERVAL,
+	on_flush=invalidate_respondents,
+)
+selfie_ingestor = SelfieIngestor(
+	bot, open_session, SELFIE_DIR, workers=SELFIE_WORKERS, thumb_size=SELFIE_THUMB_SIZE
+)
+submission_digest = SubmissionDigest(
+	bot, DB_URL, ADMIN_ID, interval=DIGEST_INTERVAL, latest=DIGEST_LATEST
+) if ADMIN_ID and DIGEST_INTERVAL > 0 else None
 
-EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-PHONE_REGEX = r'^\+?\d{10,15}$'
+MESSAGE_LIMIT = 4096
+MEDIA_GROUP_LIMIT = 10
+
+
+async def fetch_respondents_page(cursor=0, backward=False):
+	cached = directory_cache.get((cursor, backward))
+	if cached is not None:
+		return cached
+	query = select(Respondent.id, Respondent.phone, Respondent.full_name)
+	if backward:
+		query = query.where(Respondent.id < cursor).order_by(Respondent.id.desc())
+	else:
+		query = query.where(Respondent.id > cursor).order_by(Respondent.id)
+	async with open_session() as session:
+		rows = (await session.execute(query.limit(RESPONDENTS_PAGE_SIZE + 1))).all()
+	has_more = len(rows) > RESPONDENTS_PAGE_SIZE
+	rows = rows[:RESPONDENTS_PAGE_SIZE]
+	if backward:
+		rows.reverse()
+	directory_cache.set((cursor, backward), (rows, has_more))
+	return rows, has_more
+
+
+async def build_respondents_view(cursor=0, backward=False):
+	rows, has_more = await fetch_respondents_page(cursor, backward)
+	if not rows:
+		return None
+	has_prev = has_more if backward else bool(cursor)
+	has_next = True if backward else has_more
+	return get_respondents_keyboard(
+		rows,
+		prev_page=RespondentsPage(cursor=rows[0].id, back=True) if has_prev else None,
+		next_page=RespondentsPage(cursor=rows[-1].id) if has_next else None,
+	)
 
 
 @dp.message(Command("start"))
-async def start_command(message: Message, state: FSMContext):
+async def start_command(message: Message, state: FSMContext, is_admin: bool):
 	logger.info(f"User {message.from_user.id} started bot with /start")
 	await state.clear()
 
-	if message.from_user.id == ADMIN_ID:
+	if is_admin:
 		keyboard = [[KeyboardButton(text="Javoblar / Ответы")]]
 		reply_markup = ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True, one_time_keyboard=True)
 		await message.answer(
@@ -51,127 +169,387 @@ async def start_command(message: Message, state: FSMContext):
 
 
 @dp.message(F.text == "Javoblar / Ответы")
-async def handle_responses_button(message: Message, state: FSMContext):
-	if message.from_user.id != ADMIN_ID:
+async def handle_responses_button(message: Message, state: FSMContext, is_admin: bool):
+	if not is_admin:
 		logger.warning(f"Unauthorized access to Responses by user {message.from_user.id}")
 		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
 		return
 
 	logger.info(f"Admin {message.from_user.id} clicked Responses button")
-	lang = "uz"
+	keyboard = await build_respondents_view()
 
-	with SessionLocal() as session:
-		employees = session.query(Employee.user_phone, Employee.full_name).distinct(Employee.user_phone).all()
-		students = session.query(Student.user_phone, Student.full_name).distinct(Student.user_phone).all()
-		users = {phone: name for phone, name in employees + students}
-
-	if not users:
+	if keyboard is None:
 		logger.info(f"Admin {message.from_user.id} found no responses")
 		await message.answer("Hech qanday javob topilmadi / Ответы не найдены")
 		return
 
-	keyboard = InlineKeyboardMarkup(inline_keyboard=[
-		[InlineKeyboardButton(text=f"{name} ({phone})", callback_data=f"user_{phone}")]
-		for phone, name in users.items()
-	])
 	await message.answer("Foydalanuvchilarni tanlang / Выберите пользователя:", reply_markup=keyboard)
 
 
-@dp.callback_query()
-async def handle_callback_query(callback: CallbackQuery):
-	if callback.from_user.id != ADMIN_ID:
+@dp.callback_query(RespondentsPage.filter())
+async def handle_respondents_page(callback: CallbackQuery, callback_data: RespondentsPage, is_admin: bool):
+	if not is_admin:
 		logger.warning(f"Unauthorized callback access by user {callback.from_user.id}")
 		await callback.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.", show_alert=True)
 		return
 
-	data = callback.data
-	logger.info(f"Admin {callback.from_user.id} triggered callback: {data}")
-	lang = "uz"
+	logger.info(f"Admin {callback.from_user.id} opened respondents page: {callback.data}")
+	keyboard = await build_respondents_view(callback_data.cursor, callback_data.back)
+
+	if keyboard is None:
+		logger.info(f"Admin {callback.from_user.id} found no responses")
+		await callback.message.edit_text("Hech qanday javob topilmadi / Ответы не найдены")
+		await callback.answer()
+		return
+
+	await callback.message.edit_text("Foydalanuvchilarni tanlang / Выберите пользователя:", reply_markup=keyboard)
+	await callback.answer()
+
+
+def render_respondent_detail(user_phone, employees, students, thumbs=None):
+	thumbs = thumbs or {}
+	selfies = []
+	response_text = f"Foydalanuvchi: {user_phone}\n\n"
+	if employees:
+		response_text += "Xodimlar / Сотрудники:\n"
+		for emp in employees:
+			response_text += (
+				f"- Ism: {emp.full_name}\n"
+				f"  Muassasa turi: Bog‘cha / Maktab\n"
+				f"  Tug‘ilgan sana: {emp.date_of_birth}\n"
+				f"  Manzil: {emp.address}\n"
+				f"  Email: {emp.email}\n"
+				f"  Lavozim va fan: {emp.position}\n"
+				f"  Ish boshlagan sana: {emp.start_date}\n"
+				f"  Selfi: {'👇' or 'Yo‘q'}\n\n"
+			)
+			if emp.selfie_file_id:
+				selfies.append((thumbs.get(emp.selfie_unique_id), emp.selfie_file_id, f"Selfi: {emp.full_name}"))
+
+	if students:
+		response_text += "Tarbiyalanuvchilar / Воспитанники:\n"
+		for stu in students:
+			response_text += (
+				f"- Ism: {stu.full_name}\n"
+				f"  Muassasa turi: Markaz\n"
+				f"  Tug‘ilgan sana: {stu.date_of_birth}\n"
+				f"  Yoshi: {stu.age}\n"
+				f"  Manzil: {stu.address}\n"
+				f"  Diagnoz: {stu.diagnosis}\n"
+				f"  Qatnashish kunlari: {stu.attendance_days}\n"
+				f"  Ota-ona/vasiy: {stu.parent_name}\n"
+				f"  Ota-ona email: {stu.parent_email}\n"
+				f"  Ota-ona telefoni: {stu.parent_phone}\n"
+				f"  Selfi: {'👇' or 'Yo‘q'}\n\n"
+			)
+			if stu.selfie_file_id:
+				selfies.append((thumbs.get(stu.selfie_unique_id), stu.selfie_file_id, f"Selfi: {stu.full_name}"))
+	return response_text, selfies
+
+
+def _split_block(block, limit):
+	"""Cut a paragraph longer than ``limit`` at the last line break or space that fits."""
+	while len(block) > limit:
+		cut = block.rfind("\n", 0, limit + 1)
+		if cut <= 0:
+			cut = block.rfind(" ", 0, limit + 1)
+		if cut <= 0:
+			cut = limit
+		yield block[:cut]
+		block = block[cut:].lstrip("\n ")
+	yield block
+
+
+def split_message(text, limit=MESSAGE_LIMIT):
+	chunks = []
+	current = ""
+	for block in text.split("\n\n"):
+		for piece in _split_block(block.strip("\n"), limit):
+			if not piece.strip():
+				continue
+			if current and len(current) + 2 + len(piece) > limit:
+				chunks.append(current)
+				current = ""
+			current = f"{current}\n\n{piece}" if current else piece
+	if current.strip():
+		chunks.append(current)
+	return chunks
+
+
+def selfie_media(thumb_path, file_id):
+	# Serve the locally cached thumbnail; selfies submitted before ingestion existed only have a file_id
+	if thumb_path and os.path.exists(thumb_path):
+		return FSInputFile(thumb_path)
+	return file_id
+
+
+async def send_selfies(chat_id, selfies):
+	for start in range(0, len(selfies), MEDIA_GROUP_LIMIT):
+		group = selfies[start:start + MEDIA_GROUP_LIMIT]
+		if len(group) == 1:
+			thumb_path, file_id, caption = group[0]
+			await bot.send_photo(chat_id=chat_id, photo=selfie_media(thumb_path, file_id), caption=caption)
+		else:
+			await bot.send_media_group(
+				chat_id=chat_id,
+				media=[
+					InputMediaPhoto(media=selfie_media(thumb_path, file_id), caption=caption)
+					for thumb_path, file_id, caption in group
+				]
+			)
 
-	if data == "show_responses":
-		with SessionLocal() as session:
-			employees = session.query(Employee.user_phone, Employee.full_name).distinct(Employee.user_phone).all()
-			students = session.query(Student.user_phone, Student.full_name).distinct(Student.user_phone).all()
-			users = {phone: name for phone, name in employees + students}
 
-		if not users:
-			logger.info(f"Admin {callback.from_user.id} found no responses")
-			await callback.message.edit_text("Hech qanday javob topilmadi / Ответы не найдены")
-			await callback.answer()
-			return
+async def load_respondent_detail(respondent_id):
+	cached = detail_cache.get(respondent_id)
+	if cached is not None:
+		return cached
+
+	async with open_session() as session:
+		user_phone = (await session.execute(
+			select(Respondent.phone).where(Respondent.id == respondent_id)
+		)).scalar()
+		employees = (await session.execute(
+			select(Employee).where(Employee.respondent_id == respondent_id).order_by(Employee.id)
+		)).scalars().all()
+		students = (await session.execute(
+			select(Student).where(Student.respondent_id == respondent_id).order_by(Student.id)
+		)).scalars().all()
+		unique_ids = {row.selfie_unique_id for row in [*employees, *students] if row.selfie_unique_id}
+		thumbs = dict((await session.execute(
+			select(Selfie.file_unique_id, Selfie.thumb_path).where(Selfie.file_unique_id.in_(unique_ids))
+		)).all()) if unique_ids else {}
+
+	if employees or students:
+		detail = (user_phone,) + render_respondent_detail(user_phone, employees, students, thumbs)
+	else:
+		detail = (user_phone, None, [])
+	detail_cache.set(respondent_id, detail)
+	return detail
+
+
+async def build_search_view(token, offset=0):
+	query = search_queries.get(token)
+	if query is None:
+		return None, None
+	async with open_session() as session:
+		rows, has_more = await search_respondents(session, query, limit=RESPONDENTS_PAGE_SIZE, offset=offset)
+	if not rows:
+		return query, None
+	return query, get_respondents_keyboard(
+		rows,
+		prev_page=FindPage(token=token, offset=max(0, offset - RESPONDENTS_PAGE_SIZE)) if offset else None,
+		next_page=FindPage(token=token, offset=offset + RESPONDENTS_PAGE_SIZE) if has_more else None,
+	)
+
+
+@dp.message(Command("find"))
+async def find_command(message: Message, command: CommandObject, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized access to search by user {message.from_user.id}")
+		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
+		return
+
+	query = (command.args or "").strip()
+	if len(query) < MIN_QUERY_LENGTH:
+		await message.answer(
+			f"Foydalanish / Использование: /find <ism, telefon yoki email> (kamida {MIN_QUERY_LENGTH} belgi / "
+			f"минимум {MIN_QUERY_LENGTH} символа)"
+		)
+		return
+
+	token = zlib.crc32(query.encode())
+	search_queries.set(token, query)
+	logger.info(f"Admin {message.from_user.id} searched for: {query}")
+	_, keyboard = await build_search_view(token)
+	if keyboard is None:
+		await message.answer(f"«{query}» bo‘yicha hech narsa topilmadi / По запросу «{query}» ничего не найдено")
+		return
+	await message.answer(f"Qidiruv natijalari / Результаты поиска: «{query}»", reply_markup=keyboard)
+
+
+@dp.callback_query(FindPage.filter())
+async def handle_find_page(callback: CallbackQuery, callback_data: FindPage, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized callback access by user {callback.from_user.id}")
+		await callback.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.", show_alert=True)
+		return
+
+	query, keyboard = await build_search_view(callback_data.token, callback_data.offset)
+	if query is None:
+		await callback.answer("Qidiruv eskirgan, /find ni qayta yuboring / Поиск устарел, повторите /find", show_alert=True)
+		return
+	if keyboard is None:
+		await callback.message.edit_text(f"«{query}» bo‘yicha hech narsa topilmadi / По запросу «{query}» ничего не найдено")
+	else:
+		await callback.message.edit_text(f"Qidiruv natijalari / Результаты поиска: «{query}»", reply_markup=keyboard)
+	await callback.answer()
+
+
+@dp.callback_query(RespondentPick.filter())
+async def handle_respondent_pick(callback: CallbackQuery, callback_data: RespondentPick, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized callback access by user {callback.from_user.id}")
+		await callback.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.", show_alert=True)
+		return
 
-		keyboard = InlineKeyboardMarkup(inline_keyboard=[
-			[InlineKeyboardButton(text=f"{name} ({phone})", callback_data=f"user_{phone}")]
-			for phone, name in users.items()
-		])
-		await callback.message.edit_text("Foydalanuvchilarni tanlang / Выберите пользователя:", reply_markup=keyboard)
+	user_phone, response_text, selfies = await load_respondent_detail(callback_data.id)
+	logger.info(f"Admin {callback.from_user.id} selected user with phone: {user_phone}")
+	keyboard = get_respondent_back_keyboard()
+
+	if response_text is None:
+		logger.info(f"Admin {callback.from_user.id} found no responses for user_phone: {user_phone}")
+		await callback.message.edit_text(
+			"Bu foydalanuvchi uchun javoblar topilmadi / Ответы для этого пользователя не найдены",
+			reply_markup=keyboard
+		)
 		await callback.answer()
+		return
+
+	await send_selfies(callback.from_user.id, selfies)
+	chunks = split_message(response_text)
+	await callback.message.edit_text(chunks[0], reply_markup=keyboard if len(chunks) == 1 else None)
+	for index, chunk in enumerate(chunks[1:], start=2):
+		await callback.message.answer(chunk, reply_markup=keyboard if index == len(chunks) else None)
+	await callback.answer()
+
+
+@dp.message(Command("cache"))
+async def cache_stats_command(message: Message, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized access to cache stats by user {message.from_user.id}")
+		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
+		return
+
+	lines = []
+	for name, cache in (("directory", directory_cache), ("detail", detail_cache)):
+		stats = cache.stats()
+		lines.append(
+			f"{name}: {stats['size']}/{stats['maxsize']}, hits {stats['hits']}, misses {stats['misses']}, "
+			f"evictions {stats['evictions']}, hit rate {stats['hit_rate']:.0%}"
+		)
+	await message.answer("\n".join(lines))
+
+
+@dp.message(Command("sends"))
+async def send_stats_command(message: Message, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized access to send stats by user {message.from_user.id}")
+		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
+		return
+
+	stats = send_scheduler.stats()
+	await message.answer(
+		f"queued: {stats['queued_user']} user, {stats['queued_bulk']} bulk\n"
+		f"sent {stats['sent']}, retried {stats['retries']}, chats tracked {stats['chats']}\n"
+		f"waited {stats['waited']} times, avg {stats['wait_avg']:.2f}s, max {stats['wait_max']:.2f}s"
+	)
+
+
+@dp.message(Command("stats"))
+async def stats_command(message: Message, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized access to stats by user {message.from_user.id}")
+		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
+		return
 
-	elif data.startswith("user_"):
-		user_phone = data[len("user_"):]
-		logger.info(f"Admin {callback.from_user.id} selected user with phone: {user_phone}")
+	async with open_session() as session:
+		totals = await load_stats(session)
+	await message.answer(render_stats(totals))
 
-		with SessionLocal() as session:
-			employees = session.query(Employee).filter_by(user_phone=user_phone).all()
-			students = session.query(Student).filter_by(user_phone=user_phone).all()
 
-		if not (employees or students):
-			logger.info(f"Admin {callback.from_user.id} found no responses for user_phone: {user_phone}")
-			await callback.message.edit_text(
-				"Bu foydalanuvchi uchun javoblar topilmadi / Ответы для этого пользователя не найдены")
-			await callback.answer()
+@dp.message(Command("export"))
+async def export_command(message: Message, command: CommandObject, is_admin: bool):
+	if not is_admin:
+		logger.warning(f"Unauthorized export attempt by user {message.from_user.id}")
+		await message.answer("Sizda admin huquqlari yo‘q / У вас нет прав администратора.")
+		return
+
+	args = (command.args or "").split()
+	fmt = args.pop(0) if args and args[0] in FORMATS else "csv"
+	try:
+		filters = ExportFilters.parse(args)
+	except ValueError as e:
+		logger.warning(f"Admin {message.from_user.id} sent invalid export arguments: {command.args} ({str(e)})")
+		await message.answer(
+			"Foydalanish / Использование: /export [csv|jsonl] [inst=bogcha_maktab|markaz] [lang=uz|ru] "
+			"[from=yil-oy-kun] [to=yil-oy-kun]"
+		)
+		return
+
+	logger.info(f"Admin {message.from_user.id} started export: {command.args}")
+	await message.answer("Eksport tayyorlanmoqda... / Готовим экспорт...")
+	for model in (Employee, Student):
+		fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+		os.close(fd)
+		try:
+			count = await export_table(open_session, model, fmt, filters, path)
+			await message.answer_document(
+				FSInputFile(path, filename=f"{model.__tablename__}.{fmt}.gz"),
+				caption=f"{model.__tablename__}: {count}"
+			)
+		except Exception as e:
+			logger.error(f"Admin {message.from_user.id} export of {model.__tablename__} failed: {str(e)}")
+			await message.answer("Eksportda xato yuz berdi / Ошибка при экспорте")
 			return
+		finally:
+			os.remove(path)
 
-		response_text = f"Foydalanuvchi: {user_phone}\n\n"
-		if employees:
-			response_text += "Xodimlar / Сотрудники:\n"
-			for emp in employees:
-				response_text += (
-					f"- Ism: {emp.full_name}\n"
-					f"  Muassasa turi: Bog‘cha / Maktab\n"
-					f"  Tug‘ilgan sana: {emp.date_of_birth}\n"
-					f"  Manzil: {emp.address}\n"
-					f"  Email: {emp.email}\n"
-					f"  Lavozim va fan: {emp.position}\n"
-					f"  Ish boshlagan sana: {emp.start_date}\n"
-					f"  Selfi: {'👇' or 'Yo‘q'}\n\n"
-				)
-				if emp.selfie_url:
-					await bot.send_photo(
-						chat_id=callback.from_user.id,
-						photo=emp.selfie_url.split('/')[-1],  # Extract file_id
-						caption=f"Selfi: {emp.full_name}"
-					)
-
-		if students:
-			response_text += "Tarbiyalanuvchilar / Воспитанники:\n"
-			for stu in students:
-				response_text += (
-					f"- Ism: {stu.full_name}\n"
-					f"  Muassasa turi: Markaz\n"
-					f"  Tug‘ilgan sana: {stu.date_of_birth}\n"
-					f"  Yoshi: {stu.age}\n"
-					f"  Manzil: {stu.address}\n"
-					f"  Diagnoz: {stu.diagnosis}\n"
-					f"  Qatnashish kunlari: {stu.attendance_days}\n"
-					f"  Ota-ona/vasiy: {stu.parent_name}\n"
-					f"  Ota-ona email: {stu.parent_email}\n"
-					f"  Ota-ona telefoni: {stu.parent_phone}\n"
-					f"  Selfi: {'👇' or 'Yo‘q'}\n\n"
-				)
-				if stu.selfie_url:
-					await bot.send_photo(
-						chat_id=callback.from_user.id,
-						photo=stu.selfie_url.split('/')[-1], 
-						caption=f"Selfi: {stu.full_name}"
-					)
-		await callback.message.edit_text(response_text, reply_markup=keyboard)
-		await callback.answer()
+
+# Registered ahead of the per-state handlers: every survey step is resolved by one table lookup.
+@dp.message(SurveyStep())
+async def process_survey_step(message: Message, state: FSMContext, is_admin: bool, lang: str, survey_step):
+	survey, step, next_step = survey_step
+	if is_admin:
+		logger.warning(f"Admin {message.from_user.id} attempted to submit {survey.name} {step.key}")
+		await message.answer(
+			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
+		)
+		return
+
+	try:
+		value = step.validate(message.text or "")
+	except ValueError:
+		logger.warning(f"User {message.from_user.id} sent invalid {survey.name} {step.key}: {message.text}")
+		VALIDATION_FAILURES.labels(step.state.state).inc()
+		await message.answer(step.error[lang])
+		return
+	logger.info(f"User {message.from_user.id} entered {survey.name} {step.key}: {message.text}")
+	await state.update_data({step.key: value})
+	if next_step is not None:
+		await message.answer(next_step.prompt[lang])
+		await state.set_state(next_step.state)
+		return
+
+	data = await state.get_data()
+	try:
+		submission_queue.put(survey.model, dict(
+			survey.build_row(data),
+			language=Language(data["lang_text"]),
+			user_phone=data["user_phone"],
+			institution_type=InstitutionType(data["institution_type"]),
+			selfie_file_id=data.get("selfie_file_id"),
+			selfie_unique_id=data.get("selfie_unique_id")
+		))
+		logger.info(
+			f"User {message.from_user.id} queued {survey.name}: {data['full_name']}, user_phone: {data['user_phone']}, "
+			f"{InstitutionType(data['institution_type'])}")
+	except Exception as e:
+		logger.error(f"User {message.from_user.id} failed to queue {survey.name}: {str(e)}")
+		await message.answer(
+			"Ma'lumotlarni saqlashda xato yuz berdi. Iltimos, qayta urining." if lang == "uz" else
+			"Произошла ошибка при сохранении данных. Пожалуйста, попробуйте снова."
+		)
+		return
+
+	await message.answer(
+		"OK, rahmat" if lang == "uz" else "OK, спасибо"
+	)
+	await state.clear()
 
 
 @dp.message(SurveyTypeForm.language)
-async def process_language(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_language(message: Message, state: FSMContext, is_admin: bool):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to select language")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
@@ -181,23 +559,24 @@ async def process_language(message: Message, state: FSMContext):
 	language = message.text
 	logger.info(f"User {message.from_user.id} selected language: {language}")
 	if language == "🇺🇿 O‘zbekcha":
-		await state.update_data(language=Language.UZBEK, lang_text="uz")
+		await state.update_data(lang_text=Language.UZBEK.value)
 		await message.answer("Telefon raqamingizni ulashish uchun tugmani bosing:",
 							 reply_markup=get_contact_keyboard("uz"))
 	elif language == "🇷🇺 Русский":
-		await state.update_data(language=Language.RUSSIAN, lang_text="ru")
+		await state.update_data(lang_text=Language.RUSSIAN.value)
 		await message.answer("Нажмите кнопку, чтобы поделиться номером телефона:",
 							 reply_markup=get_contact_keyboard("ru"))
 	else:
 		logger.warning(f"User {message.from_user.id} sent invalid language: {language}")
+		VALIDATION_FAILURES.labels(SurveyTypeForm.language.state).inc()
 		await message.answer("Iltimos, faqat berilgan tilni tanlang / Пожалуйста, выберите только предложенный язык.")
 		return
 	await state.set_state(SurveyTypeForm.user_phone)
 
 
 @dp.message(SurveyTypeForm.user_phone, F.contact)
-async def process_user_phone(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_user_phone(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to submit phone number")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
@@ -205,19 +584,18 @@ async def process_user_phone(message: Message, state: FSMContext):
 		return
 
 	if not message.contact or not message.contact.phone_number:
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
 		logger.warning(f"User {message.from_user.id} sent empty contact")
+		VALIDATION_FAILURES.labels(SurveyTypeForm.user_phone.state).inc()
 		await message.answer(
 			"Iltimos, telefon raqamingizni ulashing." if lang == "uz" else "Пожалуйста, поделитесь номером телефона.",
 			reply_markup=get_contact_keyboard(lang)
 		)
 		return
-	phone = message.contact.phone_number
-	if not re.match(PHONE_REGEX, phone):
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid phone format: {phone}")
+	try:
+		phone = normalize_phone(message.contact.phone_number)
+	except ValueError:
+		logger.warning(f"User {message.from_user.id} sent invalid phone format: {message.contact.phone_number}")
+		VALIDATION_FAILURES.labels(SurveyTypeForm.user_phone.state).inc()
 		await message.answer(
 			"Telefon raqami noto‘g‘ri formatda (10-15 raqam kerak). Iltimos, qayta urining." if lang == "uz" else
 			"Номер телефона в неверном формате (нужно 10-15 цифр). Пожалуйста, попробуйте снова.",
@@ -226,8 +604,6 @@ async def process_user_phone(message: Message, state: FSMContext):
 		return
 	logger.info(f"User {message.from_user.id} shared phone: {phone}")
 	await state.update_data(user_phone=phone)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
 	await message.answer(
 		"Iltimos, selfi rasmingizni yuboring / Пожалуйста, отправьте ваше селфи." if lang == "uz" else
 		"Пожалуйста, отправьте ваше селфи."
@@ -236,20 +612,17 @@ async def process_user_phone(message: Message, state: FSMContext):
 
 
 @dp.message(SurveyTypeForm.selfie, F.content_type == ContentType.PHOTO)
-async def process_selfie(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_selfie(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to submit selfie")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
 		)
 		return
 
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
 	photo = message.photo[-1]  # Get highest resolution photo
-	file_id = photo.file_id
-	selfie_url = f"https://api.telegram.org/file/bot{os.getenv('BOT_TOKEN')}/{file_id}"
-	await state.update_data(selfie_url=selfie_url)
+	await state.update_data(selfie_file_id=photo.file_id, selfie_unique_id=photo.file_unique_id)
+	selfie_ingestor.submit(photo.file_id, photo.file_unique_id)
 
 	await message.answer(
 		"Siz qaysi muassasadan kelyapsiz? / Из какого учреждения вы?:" if lang == "uz" else
@@ -260,16 +633,16 @@ async def process_selfie(message: Message, state: FSMContext):
 
 
 @dp.message(SurveyTypeForm.selfie)
-async def process_invalid_selfie(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_invalid_selfie(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to submit selfie")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
 		)
 		return
 
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
+	logger.warning(f"User {message.from_user.id} sent {message.content_type} instead of a selfie")
+	VALIDATION_FAILURES.labels(SurveyTypeForm.selfie.state).inc()
 	await message.answer(
 		"Iltimos, faqat rasm yuboring / Пожалуйста, отправьте только фото." if lang == "uz" else
 		"Пожалуйста, отправьте только фото."
@@ -277,8 +650,8 @@ async def process_invalid_selfie(message: Message, state: FSMContext):
 
 
 @dp.message(SurveyTypeForm.institution_type)
-async def process_institution_type(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_institution_type(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to select institution type")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rish mumkin / Вы, как администратор, можете только просматривать ответы."
@@ -286,8 +659,6 @@ async def process_institution_type(message: Message, state: FSMContext):
 		return
 
 	institution_type = message.text
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
 	logger.info(f"User {message.from_user.id} selected institution type: {institution_type}")
 
 	if institution_type == "Bog‘cha, Maktab / Детский сад, Школа":
@@ -306,6 +677,7 @@ async def process_institution_type(message: Message, state: FSMContext):
 		await state.set_state(SurveyTypeForm.survey_type)
 	else:
 		logger.warning(f"User {message.from_user.id} sent invalid institution type: {institution_type}")
+		VALIDATION_FAILURES.labels(SurveyTypeForm.institution_type.state).inc()
 		await message.answer(
 			"Iltimos, faqat berilgan variantni tanlang (Bog‘cha, Maktab yoki Markaz)." if lang == "uz" else
 			"Пожалуйста, выберите только предложенный вариант (Bog‘cha, Maktab или Markaz)."
@@ -313,17 +685,16 @@ async def process_institution_type(message: Message, state: FSMContext):
 
 
 @dp.message(SurveyTypeForm.user_phone)
-async def process_user_phone_fallback(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_user_phone_fallback(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to submit phone number")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
 		)
 		return
 
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
 	logger.warning(f"User {message.from_user.id} sent text instead of contact: {message.text}")
+	VALIDATION_FAILURES.labels(SurveyTypeForm.user_phone.state).inc()
 	await message.answer(
 		"Iltimos, telefon raqamingizni ulashish uchun tugmani bosing." if lang == "uz" else
 		"Пожалуйста, нажмите кнопку, чтобы поделиться номером телефона.",
@@ -332,526 +703,112 @@ async def process_user_phone_fallback(message: Message, state: FSMContext):
 
 
 @dp.message(SurveyTypeForm.survey_type)
-async def process_survey_type(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
+async def process_survey_type(message: Message, state: FSMContext, is_admin: bool, lang: str):
+	if is_admin:
 		logger.warning(f"Admin {message.from_user.id} attempted to select survey type")
 		await message.answer(
 			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
 		)
 		return
 
-	survey_type = message.text
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	logger.info(f"User {message.from_user.id} selected survey type: {survey_type}")
-	if survey_type == "Xodim (O‘qituvchi) / Сотрудник (Преподаватель)":
-		await state.update_data(survey_type=survey_type)
-		await message.answer(
-			"To‘liq ism, familiyangiz?:" if lang == "uz" else "Введите ваше полное имя:"
-		)
-		await state.set_state(EmployeeForm.full_name)
-	elif survey_type == "Tarbiyalanuvchi / Воспитанник":
-		await state.update_data(survey_type=survey_type)
-		await message.answer(
-			"Bola ismi va familiyasi?:" if lang == "uz" else "Имя и фамилия ребёнка?:"
-		)
-		await state.set_state(StudentForm.full_name)
-	else:
-		logger.warning(f"User {message.from_user.id} sent invalid survey type: {survey_type}")
+	survey = SURVEY_CHOICES.get(message.text)
+	logger.info(f"User {message.from_user.id} selected survey type: {message.text}")
+	if survey is None:
+		logger.warning(f"User {message.from_user.id} sent invalid survey type: {message.text}")
+		VALIDATION_FAILURES.labels(SurveyTypeForm.survey_type.state).inc()
 		await message.answer(
 			"Iltimos, faqat berilgan variantni tanlang." if lang == "uz" else
 			"Пожалуйста, выберите только предложенный вариант."
 		)
 		return
+	await state.update_data(survey_type=message.text)
+	await message.answer(survey.first.prompt[lang])
+	await state.set_state(survey.first.state)
 
 
-@dp.message(EmployeeForm.full_name)
-async def process_employee_full_name(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee full name")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty full_name")
-		await message.answer(
-			"Iltimos, to‘liq ismni kiriting." if lang == "uz" else "Пожалуйста, введите полное имя."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered full_name: {message.text}")
-	await state.update_data(full_name=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Tug‘ilgan sanangiz? (yil-oy-kun):" if lang == "uz" else "Дата рождения? (год-месяц-день):"
+async def receive():
+	"""Receive updates from Telegram and hand them to BOT_WORKERS worker processes running this module."""
+	pool = WorkerPool(
+		BOT_WORKERS, (sys.executable, os.path.abspath(__file__)), dict(os.environ),
+		queue_size=WORKER_QUEUE_SIZE, heartbeat_timeout=WORKER_HEARTBEAT_TIMEOUT,
+		startup_timeout=DB_READY_TIMEOUT + 60,
 	)
-	await state.set_state(EmployeeForm.date_of_birth)
-
-
-@dp.message(EmployeeForm.date_of_birth)
-async def process_employee_date_of_birth(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee date of birth")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
+	receiver = build_receiver(pool)
+	# The receiver has no handlers of its own; ask Telegram for what the workers handle
+	allowed_updates = dp.resolve_used_update_types()
+	pool.start()
 	try:
-		datetime.strptime(message.text, "%Y-%m-%d")
-		logger.info(f"User {message.from_user.id} entered date_of_birth: {message.text}")
-		await state.update_data(date_of_birth=message.text)
-	except ValueError:
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid date_of_birth: {message.text}")
-		await message.answer(
-			"Iltimos, sanani to‘g‘ri formatda kiriting (yil-oy-kun)." if lang == "uz" else
-			"Пожалуйста, введите дату в правильном формате (год-месяц-день)."
-		)
-		return
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Yashash manzilingiz?:" if lang == "uz" else "Адрес проживания?:"
-	)
-	await state.set_state(EmployeeForm.address)
-
-
-@dp.message(EmployeeForm.address)
-async def process_employee_address(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee address")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty address")
-		await message.answer(
-			"Iltimos, manzilni kiriting." if lang == "uz" else "Пожалуйста, введите адрес."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered address: {message.text}")
-	await state.update_data(address=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Elektron pochtangiz?:" if lang == "uz" else "Электронная почта?:"
-	)
-	await state.set_state(EmployeeForm.email)
-
-
-@dp.message(EmployeeForm.email)
-async def process_employee_email(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee email")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not re.match(EMAIL_REGEX, message.text):
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid email: {message.text}")
-		await message.answer(
-			"Iltimos, to‘g‘ri elektron pochta kiriting (masalan, example@domain.com)." if lang == "uz" else
-			"Пожалуйста, введите корректный адрес электронной почты (например, example@domain.com)."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered email: {message.text}")
-	await state.update_data(email=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Lavozimingiz va fan (agar o‘qituvchi bo‘lsangiz)?:" if lang == "uz" else
-		"Ваша должность и предмет (если вы преподаватель)?:"
-	)
-	await state.set_state(EmployeeForm.position)
-
-
-@dp.message(EmployeeForm.position)
-async def process_employee_position(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee position")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty position")
-		await message.answer(
-			"Iltimos, lavozimni kiriting." if lang == "uz" else "Пожалуйста, введите должность."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered position: {message.text}")
-	await state.update_data(position=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Ish boshlagan sanangiz? (yil-oy-kun):" if lang == "uz" else "Дата начала работы? (год-месяц-день):"
-	)
-	await state.set_state(EmployeeForm.start_date)
-
-
-@dp.message(EmployeeForm.start_date)
-async def process_employee_start_date(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit employee start date")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	try:
-		datetime.strptime(message.text, "%Y-%m-%d")
-		logger.info(f"User {message.from_user.id} entered start_date: {message.text}")
-	except ValueError:
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid start_date: {message.text}")
-		await message.answer(
-			"Iltimos, sanani to‘g‘ri formatda kiriting (yil-oy-kun)." if lang == "uz" else
-			"Пожалуйста, введите дату в правильном формате (год-месяц-день)."
-		)
-		return
-
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-
-	try:
-		with SessionLocal() as session:
-			employee = Employee(
-				full_name=data["full_name"],
-				date_of_birth=datetime.strptime(data["date_of_birth"], "%Y-%m-%d").date(),
-				address=data["address"],
-				email=data["email"],
-				position=data["position"],
-				subject=data["position"] if "o‘qituvchi" in data["position"].lower() or "преподаватель" in data[
-					"position"].lower() else None,
-				start_date=datetime.strptime(message.text, "%Y-%m-%d").date(),
-				language=data["language"],
-				user_phone=data["user_phone"],
-				institution_type=InstitutionType(data["institution_type"]),
-				selfie_url=data.get("selfie_url")
+		# Updates are queued for workers that are not up yet, but replies would wait for their startup
+		if not await pool.wait_ready(timeout=DB_READY_TIMEOUT + 60):
+			logger.warning("Not all workers are ready, receiving updates anyway")
+		if RUN_MODE == "webhook":
+			await run_webhook(
+				receiver, bot,
+				host=WEBHOOK_HOST,
+				port=WEBHOOK_PORT,
+				path=WEBHOOK_PATH,
+				base_url=WEBHOOK_URL,
+				secret_token=WEBHOOK_SECRET,
+				max_in_flight=WEBHOOK_MAX_IN_FLIGHT,
+				allowed_updates=allowed_updates,
 			)
-			session.add(employee)
-			session.commit()
-		logger.info(
-			f"User {message.from_user.id} saved employee: {data['full_name']}, user_phone: {data['user_phone']}, "
-			f"{InstitutionType(data['institution_type'])}")
-	except Exception as e:
-		logger.error(f"User {message.from_user.id} failed to save employee: {str(e)}")
-		await message.answer(
-			"Ma'lumotlarni saqlashda xato yuz berdi. Iltimos, qayta urining." if lang == "uz" else
-			"Произошла ошибка при сохранении данных. Пожалуйста, попробуйте снова."
-		)
-		return
-
-	await message.answer(
-		"OK, rahmat" if lang == "uz" else "OK, спасибо"
-	)
-	await state.clear()
-
-
-@dp.message(StudentForm.full_name)
-async def process_student_full_name(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student full name")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty student full_name")
-		await message.answer(
-			"Iltimos, bola ismi va familiyasini kiriting." if lang == "uz" else
-			"Пожалуйста, введите имя и фамилию ребёнка."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student full_name: {message.text}")
-	await state.update_data(full_name=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Tug‘ilgan sanasi? (yil-oy-kun):" if lang == "uz" else "Дата рождения? (год-месяц-день):"
-	)
-	await state.set_state(StudentForm.date_of_birth)
-
-
-@dp.message(StudentForm.date_of_birth)
-async def process_student_date_of_birth(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student date of birth")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	try:
-		datetime.strptime(message.text, "%Y-%m-%d")
-		logger.info(f"User {message.from_user.id} entered student date_of_birth: {message.text}")
-		await state.update_data(date_of_birth=message.text)
-	except ValueError:
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid student date_of_birth: {message.text}")
-		await message.answer(
-			"Iltimos, sanani to‘g‘ri formatda kiriting (yil-oy-kun)." if lang == "uz" else
-			"Пожалуйста, введите дату в правильном формате (год-месяц-день)."
-		)
-		return
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Yoshi?:" if lang == "uz" else "Возраст?:"
-	)
-	await state.set_state(StudentForm.age)
-
-
-@dp.message(StudentForm.age)
-async def process_student_age(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student age")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	try:
-		age = int(message.text)
-		if age <= 0:
-			raise ValueError
-		logger.info(f"User {message.from_user.id} entered student age: {age}")
-		await state.update_data(age=age)
-	except ValueError:
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid student age: {message.text}")
-		await message.answer(
-			"Iltimos, yoshni to‘g‘ri raqamda kiriting." if lang == "uz" else
-			"Пожалуйста, введите возраст корректным числом."
-		)
-		return
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Yashash manzili?:" if lang == "uz" else "Адрес проживания?:"
-	)
-	await state.set_state(StudentForm.address)
-
-
-@dp.message(StudentForm.address)
-async def process_student_address(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student address")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty student address")
-		await message.answer(
-			"Iltimos, manzilni kiriting." if lang == "uz" else "Пожалуйста, введите адрес."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student address: {message.text}")
-	await state.update_data(address=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Diagnozi qanday?:" if lang == "uz" else "Какой диагноз у ребёнка?:"
-	)
-	await state.set_state(StudentForm.diagnosis)
-
-
-@dp.message(StudentForm.diagnosis)
-async def process_student_diagnosis(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student diagnosis")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty student diagnosis")
-		await message.answer(
-			"Iltimos, diagnozni kiriting." if lang == "uz" else "Пожалуйста, введите диагноз."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student diagnosis: {message.text}")
-	await state.update_data(diagnosis=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Haftaning qaysi kunlari qatnashadi?:" if lang == "uz" else "В какие дни посещает?:"
-	)
-	await state.set_state(StudentForm.attendance_days)
-
-
-@dp.message(StudentForm.attendance_days)
-async def process_student_attendance_days(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student attendance days")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty student attendance_days")
-		await message.answer(
-			"Iltimos, qatnashadigan kunlarni kiriting." if lang == "uz" else
-			"Пожалуйста, введите дни посещения."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student attendance_days: {message.text}")
-	await state.update_data(attendance_days=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Ota-ona yoki vasiy ismi?:" if lang == "uz" else "Имя родителя или опекуна?:"
-	)
-	await state.set_state(StudentForm.parent_name)
-
-
-@dp.message(StudentForm.parent_name)
-async def process_student_parent_name(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student parent name")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not message.text.strip():
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent empty student parent_name")
-		await message.answer(
-			"Iltimos, ota-ona yoki vasiy ismini kiriting." if lang == "uz" else
-			"Пожалуйста, введите имя родителя или опекуна."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student parent_name: {message.text}")
-	await state.update_data(parent_name=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Elektron pochta?:" if lang == "uz" else "Электронная почта?:"
-	)
-	await state.set_state(StudentForm.parent_email)
-
-
-@dp.message(StudentForm.parent_email)
-async def process_student_parent_email(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student parent email")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not re.match(EMAIL_REGEX, message.text):
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid student parent_email: {message.text}")
-		await message.answer(
-			"Iltimos, to‘g‘ri elektron pochta kiriting (masalan, example@domain.com)." if lang == "uz" else
-			"Пожалуйста, введите корректный адрес электронной почты (например, example@domain.com)."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student parent_email: {message.text}")
-	await state.update_data(parent_email=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-	await message.answer(
-		"Telefon raqami?:" if lang == "uz" else "Контактный номер телефона?:"
-	)
-	await state.set_state(StudentForm.parent_phone)
-
-
-@dp.message(StudentForm.parent_phone)
-async def process_student_parent_phone(message: Message, state: FSMContext):
-	if message.from_user.id == ADMIN_ID:
-		logger.warning(f"Admin {message.from_user.id} attempted to submit student parent phone")
-		await message.answer(
-			"Siz admin sifatida faqat javoblarni ko‘rishingiz mumkin / Вы, как администратор, можете только просматривать ответы."
-		)
-		return
-
-	if not re.match(PHONE_REGEX, message.text):
-		data = await state.get_data()
-		lang = data.get("lang_text", "uz")
-		logger.warning(f"User {message.from_user.id} sent invalid student parent_phone: {message.text}")
-		await message.answer(
-			"Iltimos, to‘g‘ri telefon raqamini kiriting (10-15 raqam, + bilan yoki bilansiz)." if lang == "uz" else
-			"Пожалуйста, введите корректный номер телефона (10-15 цифр, с + или без)."
-		)
-		return
-	logger.info(f"User {message.from_user.id} entered student parent_phone: {message.text}")
-	await state.update_data(parent_phone=message.text)
-	data = await state.get_data()
-	lang = data.get("lang_text", "uz")
-
+		else:
+			# Forwarding only enqueues, so updates are passed on in order
+			await receiver.start_polling(bot, handle_as_tasks=False, allowed_updates=allowed_updates)
+	finally:
+		await pool.stop()
+
+
+async def serve():
+	await submission_queue.start()
+	await selfie_ingestor.start()
+	if submission_digest is not None:
+		await submission_digest.start()
 	try:
-		with SessionLocal() as session:
-			student = Student(
-				full_name=data["full_name"],
-				date_of_birth=datetime.strptime(data["date_of_birth"], "%Y-%m-%d").date(),
-				age=int(data["age"]),
-				address=data["address"],
-				diagnosis=data["diagnosis"],
-				attendance_days=data["attendance_days"],
-				parent_name=data["parent_name"],
-				parent_email=data["parent_email"],
-				parent_phone=message.text,
-				language=data["language"],
-				user_phone=data["user_phone"],
-				institution_type=InstitutionType(data["institution_type"]),
-				selfie_url=data.get("selfie_url")
+		# All runners handle SIGTERM by stopping intake, so the queue is drained below
+		if BOT_WORKER_INDEX is not None:
+			await run_worker(dp, bot, heartbeat_interval=WORKER_HEARTBEAT_INTERVAL, max_in_flight=WEBHOOK_MAX_IN_FLIGHT)
+		elif RUN_MODE == "webhook":
+			await run_webhook(
+				dp, bot,
+				host=WEBHOOK_HOST,
+				port=WEBHOOK_PORT,
+				path=WEBHOOK_PATH,
+				base_url=WEBHOOK_URL,
+				secret_token=WEBHOOK_SECRET,
+				max_in_flight=WEBHOOK_MAX_IN_FLIGHT,
 			)
-			session.add(student)
-			session.commit()
-		logger.info(f"User {message.from_user.id} saved student: {data['full_name']}, user_phone: {data['user_phone']}")
-	except Exception as e:
-		logger.error(f"User {message.from_user.id} failed to save student: {str(e)}")
-		await message.answer(
-			"Ma'lumotlarni saqlashda xato yuz berdi. Iltimos, qayta urining." if lang == "uz" else
-			"Произошла ошибка при сохранении данных. Пожалуйста, попробуйте снова."
-		)
-		return
+		else:
+			await dp.start_polling(bot)
+	finally:
+		await selfie_ingestor.stop()
+		await submission_queue.stop()
+		if submission_digest is not None:
+			await submission_digest.stop()
 
-	await message.answer(
-		"OK, rahmat" if lang == "uz" else "OK, спасибо"
-	)
-	await state.clear()
+
+async def refresh_conversations():
+	set_conversations(await count_states(storage))
 
 
 async def main():
-	await dp.start_polling(bot)
+	await wait_for_database()
+	if DB_MIGRATE_ON_START:
+		await run_migrations()
+	instrument_engine(get_async_engine().sync_engine)
+	logger.info("Database ready")
+	metrics_runner = await start_metrics_server(
+		METRICS_HOST, METRICS_PORT, collect=refresh_conversations
+	) if METRICS_PORT else None
+	try:
+		if BOT_WORKERS and BOT_WORKER_INDEX is None:
+			await receive()
+		else:
+			await serve()
+	finally:
+		if metrics_runner is not None:
+			await metrics_runner.cleanup()
+		await get_async_engine().dispose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+import logging
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.fsm.storage.base import BaseStorage
+from aiohttp import web
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+HANDLER_SECONDS = Histogram(
+	"bot_handler_seconds", "Time spent in a dispatcher handler", ["handler"], buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised", ["handler"])
+DB_SECONDS = Histogram(
+	"bot_db_seconds", "Database statement and commit time", ["operation"], buckets=LATENCY_BUCKETS
+)
+FSM_SECONDS = Histogram(
+	"bot_fsm_storage_seconds", "FSM storage call time", ["operation"], buckets=LATENCY_BUCKETS
+)
+# Storage round-trips per update made by UpdateContextMiddleware: (reads + writes) / updates
+FSM_UPDATES = Counter("bot_fsm_updates_total", "Updates handled with a buffered FSM context")
+FSM_READS = Counter("bot_fsm_reads_total", "FSM data reads made for those updates")
+FSM_WRITES = Counter("bot_fsm_writes_total", "FSM storage writes made for those updates")
+BOT_API_SECONDS = Histogram(
+	"bot_api_seconds", "Bot API call time, excluding time queued for flood limits", ["method"],
+	buckets=LATENCY_BUCKETS,
+)
+BOT_API_ERRORS = Counter("bot_api_errors_total", "Bot API calls that failed", ["method"])
+VALIDATION_FAILURES = Counter("bot_validation_failures_total", "Rejected survey answers", ["state"])
+# Read from the FSM storage on every scrape (see start_metrics_server). A shared storage
+# (redis, postgres) gives every process the same totals, so aggregate those with max().
+CONVERSATIONS = Gauge("bot_conversations", "Conversations currently in each FSM state", ["state"])
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+	"""Inner middleware timing each handler by its function name."""
+
+	async def __call__(self, handler, event, data):
+		name = data["handler"].callback.__name__
+		started = time.perf_counter()
+		try:
+			return await handler(event, data)
+		except Exception:
+			HANDLER_ERRORS.labels(name).inc()
+			raise
+		finally:
+			HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+class BotApiMetrics(BaseRequestMiddleware):
+	async def __call__(self, make_request, bot, method):
+		name = type(method).__name__
+		started = time.perf_counter()
+		try:
+			return await make_request(bot, method)
+		except Exception:
+			BOT_API_ERRORS.labels(name).inc()
+			raise
+		finally:
+			BOT_API_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+class InstrumentedStorage(BaseStorage):
+	"""Times every call to the wrapped FSM storage."""
+
+	def __init__(self, storage):
+		self.storage = storage
+		if hasattr(storage, "set_state_and_data"):
+			self.set_state_and_data = self._set_state_and_data
+
+	async def _timed(self, operation, call, *args):
+		started = time.perf_counter()
+		try:
+			return await call(*args)
+		finally:
+			FSM_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+	async def set_state(self, key, state=None):
+		await self._timed("set_state", self.storage.set_state, key, state)
+
+	async def get_state(self, key):
+		return await self._timed("get_state", self.storage.get_state, key)
+
+	async def set_data(self, key, data):
+		await self._timed("set_data", self.storage.set_data, key, data)
+
+	async def get_data(self, key):
+		return await self._timed("get_data", self.storage.get_data, key)
+
+	async def _set_state_and_data(self, key, state, data):
+		await self._timed("set_state_and_data", self.storage.set_state_and_data, key, state, data)
+
+	async def close(self):
+		await self.storage.close()
+
+
+def instrument_engine(engine):
+	"""Time statements (by SQL verb) and commits on a sync ``Engine`` or the ``sync_engine`` of an async one."""
+
+	@event.listens_for(engine, "before_cursor_execute")
+	def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+		conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+		started = conn.info["query_started"].pop()
+		operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+		DB_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+	# Connection events have no hook after COMMIT returns, so the dialect call is wrapped instead.
+	dialect = engine.dialect
+	do_commit = dialect.do_commit
+
+	def timed_commit(dbapi_connection):
+		started = time.perf_counter()
+		try:
+			do_commit(dbapi_connection)
+		finally:
+			DB_SECONDS.labels("commit").observe(time.perf_counter() - started)
+
+	dialect.do_commit = timed_commit
+
+
+def set_conversations(counts):
+	"""Replace the conversation gauge with ``{state: count}``; states missing from ``counts`` drop out."""
+	CONVERSATIONS.clear()
+	for state, count in counts.items():
+		CONVERSATIONS.labels(state).set(count)
+
+
+async def start_metrics_server(host, port, collect=None):
+	"""Serve ``/metrics`` in Prometheus text format; returns the runner to clean up on shutdown.
+
+	``collect`` (optional) is awaited before every scrape to refresh gauges read from elsewhere.
+	"""
+
+	async def handle_metrics(request):
+		if collect is not None:
+			try:
+				await collect()
+			except Exception as e:
+				logger.warning(f"Failed to collect metrics, serving the previous values: {str(e)}")
+		return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+	app = web.Application()
+	app.router.add_get("/metrics", handle_metrics)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	await web.TCPSite(runner, host, port).start()
+	logger.info(f"Metrics served on {host}:{port}/metrics")
+	return runner
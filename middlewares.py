@@ -0,0 +1,152 @@
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+from metrics import FSM_READS, FSM_UPDATES, FSM_WRITES
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+	"""Per-user token bucket: ``rate`` events per second with bursts up to ``burst``.
+
+	Buckets live in an LRU-ordered dict of ``user_id -> (tokens, last_seen)`` capped at
+	``max_users`` entries; buckets idle for longer than ``idle_ttl`` seconds are evicted
+	first. An evicted user simply starts again with a full bucket.
+	"""
+
+	def __init__(self, rate, burst, max_users=10000, idle_ttl=600.0, exempt=()):
+		self.rate = rate
+		self.burst = burst
+		self.max_users = max_users
+		self.idle_ttl = idle_ttl
+		self.exempt = frozenset(exempt)
+		self._buckets = OrderedDict()
+		self.dropped = 0
+
+	async def __call__(self, handler, event, data):
+		user = data.get("event_from_user")
+		if user is None or user.id in self.exempt:
+			return await handler(event, data)
+
+		now = time.monotonic()
+		bucket = self._buckets.pop(user.id, None)
+		tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+		allowed = tokens >= 1
+		self._buckets[user.id] = (tokens - 1 if allowed else tokens, now)
+		self._evict(now)
+
+		if not allowed:
+			self.dropped += 1
+			logger.debug(f"Throttled {type(event).__name__} from user {user.id}")
+			if isinstance(event, CallbackQuery):
+				await event.answer()
+			return None
+		return await handler(event, data)
+
+	def _evict(self, now):
+		buckets = self._buckets
+		while buckets:
+			oldest_seen = next(iter(buckets.values()))[1]
+			if len(buckets) <= self.max_users and now - oldest_seen <= self.idle_ttl:
+				break
+			buckets.popitem(last=False)
+
+	def __len__(self):
+		return len(self._buckets)
+
+
+class BufferedFSMContext(FSMContext):
+	"""FSMContext over state and data loaded once per update; changes are written back by ``flush``."""
+
+	def __init__(self, context, state, data):
+		super().__init__(context.storage, context.key)
+		self._state = state
+		self._data = data
+		self._state_dirty = False
+		self._data_dirty = False
+
+	async def get_state(self):
+		return self._state
+
+	async def set_state(self, state=None):
+		self._state = state.state if isinstance(state, State) else state
+		self._state_dirty = True
+
+	async def get_data(self):
+		return dict(self._data)
+
+	async def set_data(self, data):
+		self._data = dict(data)
+		self._data_dirty = True
+
+	async def update_data(self, data=None, **kwargs):
+		if data:
+			kwargs.update(data)
+		self._data.update(kwargs)
+		self._data_dirty = True
+		return dict(self._data)
+
+	async def get_value(self, key, default=None):
+		return self._data.get(key, default)
+
+	async def clear(self):
+		await self.set_state(None)
+		await self.set_data({})
+
+	async def flush(self):
+		"""Write pending changes and return the number of storage writes issued."""
+		if self._state_dirty and self._data_dirty and hasattr(self.storage, "set_state_and_data"):
+			await self.storage.set_state_and_data(self.key, self._state, self._data)
+			writes = 1
+		else:
+			writes = 0
+			if self._state_dirty:
+				await self.storage.set_state(self.key, self._state)
+				writes += 1
+			if self._data_dirty:
+				await self.storage.set_data(self.key, self._data)
+				writes += 1
+		self._state_dirty = self._data_dirty = False
+		return writes
+
+
+class UpdateContextMiddleware(BaseMiddleware):
+	"""Injects ``is_admin`` and ``lang`` and swaps ``state`` for a BufferedFSMContext.
+
+	State data is read at most once per update (not at all outside a conversation)
+	and all changes a handler makes are written back in a single batch afterwards.
+	The whole data dict is written back, so the dispatcher must run with events
+	isolation (see storage.build_storage). Reads, writes and updates are counted in
+	``bot_fsm_*_total``.
+	"""
+
+	def __init__(self, admin_id):
+		self.admin_id = admin_id
+
+	async def __call__(self, handler, event, data):
+		user = data.get("event_from_user")
+		data["is_admin"] = user is not None and user.id == self.admin_id
+		context = data.get("state")
+		if context is None:
+			data["lang"] = "uz"
+			return await handler(event, data)
+
+		raw_state = data.get("raw_state")
+		state_data = {}
+		if raw_state is not None:
+			state_data = await context.get_data()
+			FSM_READS.inc()
+		buffered = BufferedFSMContext(context, raw_state, state_data)
+		data["state"] = buffered
+		data["lang"] = state_data.get("lang_text", "uz")
+		FSM_UPDATES.inc()
+		try:
+			return await handler(event, data)
+		finally:
+			FSM_WRITES.inc(await buffered.flush())
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+USER_LANE = "user"
+BULK_LANE = "bulk"
+
+
+def _refill(tokens, stamp, rate, burst, now):
+	return min(burst, tokens + (now - stamp) * rate)
+
+
+class SendScheduler(BaseRequestMiddleware):
+	"""Paces every Bot API call that targets a chat against Telegram's flood limits.
+
+	A global bucket allows ``global_rate`` calls per second and each chat has its own
+	bucket: ``chat_rate`` per second with bursts of ``chat_burst`` for private chats,
+	``group_rate`` per second for groups. Per-chat buckets live in an LRU-ordered dict of
+	``chat_id -> (tokens, last_seen, paused_until)`` capped at ``max_chats``.
+
+	Calls to ``bulk_chats`` (the admin views) go through the bulk lane: while user-facing
+	calls are waiting, bulk calls only take global tokens left over beyond one per waiting
+	user call. A 429 pauses the chat for ``retry_after``
+	seconds and the call is retried up to ``max_retries`` times. Calls without a chat
+	(getFile, answerCallbackQuery, setWebhook) are not paced.
+	"""
+
+	def __init__(self, global_rate=30.0, chat_rate=1.0, chat_burst=3, group_rate=20 / 60, max_chats=10000,
+				 max_retries=3, bulk_chats=()):
+		self.global_rate = global_rate
+		self.chat_rate = chat_rate
+		self.chat_burst = chat_burst
+		self.group_rate = group_rate
+		self.max_chats = max_chats
+		self.max_retries = max_retries
+		self.bulk_chats = frozenset(bulk_chats)
+		self._global = (global_rate, time.monotonic())
+		self._chats = OrderedDict()
+		self._waiting = {USER_LANE: 0, BULK_LANE: 0}
+		self.sent = 0
+		self.retries = 0
+		self.waited = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+
+	async def __call__(self, make_request, bot, method):
+		chat_id = getattr(method, "chat_id", None)
+		if chat_id is None:
+			return await make_request(bot, method)
+
+		lane = BULK_LANE if chat_id in self.bulk_chats else USER_LANE
+		attempt = 0
+		while True:
+			await self._acquire(chat_id, lane)
+			try:
+				response = await make_request(bot, method)
+			except TelegramRetryAfter as e:
+				if attempt >= self.max_retries:
+					raise
+				attempt += 1
+				self.retries += 1
+				self._pause(chat_id, e.retry_after)
+				logger.warning(
+					f"Flood limit on {type(method).__name__} to chat {chat_id}, retrying in {e.retry_after}s "
+					f"(attempt {attempt}/{self.max_retries})"
+				)
+				continue
+			self.sent += 1
+			return response
+
+	def _chat_limits(self, chat_id):
+		if isinstance(chat_id, int) and chat_id > 0:
+			return self.chat_rate, self.chat_burst
+		return self.group_rate, 1
+
+	def _global_tokens(self, now):
+		return _refill(*self._global, self.global_rate, self.global_rate, now)
+
+	def _delay(self, chat_id, now):
+		rate, burst = self._chat_limits(chat_id)
+		tokens, stamp, paused_until = self._chats.get(chat_id, (burst, now, 0.0))
+		chat_tokens = _refill(tokens, stamp, rate, burst, now)
+		global_tokens = self._global_tokens(now)
+		return max(
+			paused_until - now,
+			(1 - chat_tokens) / rate,
+			(1 - global_tokens) / self.global_rate,
+		)
+
+	def _take(self, chat_id, now):
+		rate, burst = self._chat_limits(chat_id)
+		tokens, stamp, paused_until = self._chats.pop(chat_id, (burst, now, 0.0))
+		self._chats[chat_id] = (_refill(tokens, stamp, rate, burst, now) - 1, now, paused_until)
+		self._global = (self._global_tokens(now) - 1, now)
+		while len(self._chats) > self.max_chats:
+			self._chats.popitem(last=False)
+
+	def _pause(self, chat_id, seconds):
+		now = time.monotonic()
+		tokens, stamp, _ = self._chats.pop(chat_id, (0, now, 0.0))
+		self._chats[chat_id] = (tokens, stamp, now + seconds)
+
+	async def _acquire(self, chat_id, lane):
+		started = time.monotonic()
+		self._waiting[lane] += 1
+		try:
+			while True:
+				now = time.monotonic()
+				delay = self._delay(chat_id, now)
+				if lane == BULK_LANE and self._global_tokens(now) < self._waiting[USER_LANE] + 1:
+					delay = max(delay, 1 / self.global_rate)
+				if delay <= 0:
+					self._take(chat_id, now)
+					break
+				await asyncio.sleep(delay)
+		finally:
+			self._waiting[lane] -= 1
+
+		waited = time.monotonic() - started
+		if waited > 0.001:
+			self.waited += 1
+			self.wait_total += waited
+			self.wait_max = max(self.wait_max, waited)
+
+	def stats(self):
+		return {
+			"queued_user": self._waiting[USER_LANE],
+			"queued_bulk": self._waiting[BULK_LANE],
+			"sent": self.sent,
+			"retries": self.retries,
+			"waited": self.waited,
+			"wait_avg": self.wait_total / self.waited if self.waited else 0.0,
+			"wait_max": self.wait_max,
+			"chats": len(self._chats),
+		}
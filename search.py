@@ -0,0 +1,77 @@
+import re
+
+from sqlalchemy import select, func, or_, literal, literal_column, union_all, String
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+
+from database import Employee, Student, Respondent
+
+MIN_QUERY_LENGTH = 3
+
+# Searched columns per table; every one has a trigram index (migration 0006)
+TEXT_COLUMNS = {
+	Employee: (Employee.full_name, Employee.email),
+	Student: (Student.full_name, Student.parent_name, Student.parent_email),
+}
+PHONE_COLUMNS = {
+	Employee: (Employee.user_phone,),
+	Student: (Student.user_phone, Student.parent_phone),
+}
+
+
+def digits(column):
+	# Constants are inlined rather than bound so the expression matches the indexed one
+	return func.regexp_replace(column, literal_column(r"'\D'"), literal_column("''"), literal_column("'g'"))
+
+
+def _escape_like(text):
+	return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def is_phone_query(query):
+	return not re.search(r"[^\d\s()+-]", query) and len(re.sub(r"\D", "", query)) >= MIN_QUERY_LENGTH
+
+
+def _text_hits(model, query):
+	columns = TEXT_COLUMNS[model]
+	pattern = f"%{_escape_like(query)}%"
+	term = literal(query, String)
+	return select(
+		model.respondent_id,
+		model.full_name.label("match"),
+		func.greatest(*(func.word_similarity(term, column) for column in columns)).label("score"),
+	).where(or_(*(or_(column.ilike(pattern), term.op("<%")(column)) for column in columns)))
+
+
+def _phone_hits(model, query):
+	number = re.sub(r"\D", "", query)
+	columns = [digits(column) for column in PHONE_COLUMNS[model]]
+	return select(
+		model.respondent_id,
+		model.full_name.label("match"),
+		func.greatest(*(func.similarity(column, number) for column in columns)).label("score"),
+	).where(or_(*(column.like(f"%{number}%") for column in columns)))
+
+
+def build_search_query(query, limit, offset=0):
+	"""Respondents whose employee or student submissions match ``query``, best match first.
+
+	Rows are ``(id, phone, full_name)`` where ``full_name`` is the best matching submission;
+	one extra row is fetched so callers can tell whether another page follows.
+	"""
+	hits_for = _phone_hits if is_phone_query(query) else _text_hits
+	hits = union_all(*(hits_for(model, query) for model in TEXT_COLUMNS)).subquery()
+	best_match = func.array_agg(aggregate_order_by(hits.c.match, hits.c.score.desc()), type_=ARRAY(String))[1]
+	return (
+		select(Respondent.id, Respondent.phone, best_match.label("full_name"))
+		.join(hits, hits.c.respondent_id == Respondent.id)
+		.group_by(Respondent.id)
+		.order_by(func.max(hits.c.score).desc(), Respondent.id)
+		.offset(offset)
+		.limit(limit + 1)
+	)
+
+
+async def search_respondents(session, query, limit=20, offset=0):
+	"""Return ``(rows, has_more)`` for one page of search results."""
+	rows = (await session.execute(build_search_query(query, limit, offset))).all()
+	return rows[:limit], len(rows) > limit
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from io import BytesIO
+
+from PIL import Image
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from database import Selfie
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomically(path, write):
+	"""Call ``write`` with a temporary name next to ``path``, then move the file into place.
+
+	The name is unique per call, so concurrent workers (or processes) storing the same
+	image never write into each other's file; the last rename wins with identical content.
+	"""
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	partial = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+	try:
+		write(partial)
+		os.replace(partial, path)
+	finally:
+		if os.path.exists(partial):
+			os.remove(partial)
+
+
+def _save_thumbnail(content, thumb_size, path):
+	with Image.open(BytesIO(content)) as image:
+		image = image.convert("RGB")
+		image.thumbnail((thumb_size, thumb_size))
+		image.save(path, format="JPEG", quality=85)
+
+
+def _store(directory, sha256, content, thumb_size):
+	"""Write the original and its thumbnail under their hash unless they already exist."""
+	path = os.path.join(directory, sha256[:2], f"{sha256}.jpg")
+	thumb_path = os.path.join(directory, "thumbs", sha256[:2], f"{sha256}.jpg")
+	if not os.path.exists(path):
+		def write_original(partial):
+			with open(partial, "wb") as original:
+				original.write(content)
+
+		_write_atomically(path, write_original)
+	if not os.path.exists(thumb_path):
+		_write_atomically(thumb_path, lambda partial: _save_thumbnail(content, thumb_size, partial))
+	return path, thumb_path
+
+
+class SelfieIngestor:
+	"""Downloads submitted selfies with a bounded pool of workers.
+
+	Files are stored content-addressed by SHA-256 under ``directory`` so the same
+	image is kept once, and each Telegram file gets a ``selfies`` row with its hash,
+	original and thumbnail paths.
+	"""
+
+	def __init__(self, bot, session_factory, directory, workers=4, thumb_size=320):
+		self._bot = bot
+		self._session_factory = session_factory
+		self._directory = directory
+		self._workers = workers
+		self._thumb_size = thumb_size
+		self._queue = asyncio.Queue()
+		self._tasks = []
+
+	def submit(self, file_id, file_unique_id):
+		self._queue.put_nowait((file_id, file_unique_id))
+
+	async def start(self):
+		self._tasks = [asyncio.create_task(self._work()) for _ in range(self._workers)]
+
+	async def stop(self):
+		await self._queue.join()
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+
+	async def _work(self):
+		while True:
+			file_id, file_unique_id = await self._queue.get()
+			try:
+				await self._ingest(file_id, file_unique_id)
+			except Exception as e:
+				logger.error(f"Failed to ingest selfie {file_unique_id}: {str(e)}")
+			finally:
+				self._queue.task_done()
+
+	async def _ingest(self, file_id, file_unique_id):
+		async with self._session_factory() as session:
+			known = (await session.execute(
+				select(Selfie.id).where(Selfie.file_unique_id == file_unique_id)
+			)).scalar()
+		if known is not None:
+			return
+
+		content = (await self._bot.download(file_id, destination=BytesIO())).getvalue()
+		sha256 = hashlib.sha256(content).hexdigest()
+		path, thumb_path = await asyncio.to_thread(_store, self._directory, sha256, content, self._thumb_size)
+
+		async with self._session_factory() as session:
+			await session.execute(
+				insert(Selfie).values(
+					file_unique_id=file_unique_id,
+					file_id=file_id,
+					sha256=sha256,
+					path=path,
+					thumb_path=thumb_path,
+				).on_conflict_do_nothing(index_elements=[Selfie.file_unique_id])
+			)
+			await session.commit()
+		logger.info(f"Ingested selfie {file_unique_id} as {sha256}")
@@ -0,0 +1,131 @@
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import select, func, case, cast, delete, insert, literal, text, true, Date
+from sqlalchemy.dialects.postgresql import insert as upsert
+
+from archive import archived_before
+from database import Employee, Student, SubmissionStats, InstitutionType, Language
+
+SURVEYS = {Employee.__tablename__: "employee", Student.__tablename__: "student"}
+# Upper bound (inclusive) and label; migration 0007 backfills with the same buckets
+AGE_BUCKETS = ((3, "0-3"), (6, "4-6"), (10, "7-10"), (14, "11-14"), (None, "15+"))
+KEY_COLUMNS = ("day", "survey", "institution_type", "language", "age_bucket")
+
+
+def age_bucket(age):
+	for upper, label in AGE_BUCKETS:
+		if upper is None or age <= upper:
+			return label
+
+
+def _age_bucket_sql(column):
+	return case(
+		*((column <= upper, label) for upper, label in AGE_BUCKETS if upper is not None),
+		else_=AGE_BUCKETS[-1][1],
+	)
+
+
+def _utc_midnight(day):
+	return datetime.combine(day, time.min, timezone.utc)
+
+
+def _utc_date(value):
+	return cast(func.timezone("UTC", value), Date)
+
+
+async def record_submissions(session, batch):
+	"""Add a batch of ``(table, row)`` submissions to the rollup within the caller's transaction."""
+	counts = Counter()
+	for table, row in batch:
+		bucket = age_bucket(row["age"]) if row.get("age") is not None else ""
+		counts[(SURVEYS[table], row["institution_type"].name, row["language"].name, bucket)] += 1
+	if not counts:
+		return
+	stmt = upsert(SubmissionStats).values([
+		dict(
+			day=_utc_date(func.now()), survey=survey, institution_type=institution_type, language=language,
+			age_bucket=bucket, count=count,
+		)
+		for (survey, institution_type, language, bucket), count in counts.items()
+	])
+	stmt = stmt.on_conflict_do_update(
+		index_elements=KEY_COLUMNS,
+		set_={"count": SubmissionStats.count + stmt.excluded.count},
+	)
+	await session.execute(stmt)
+
+
+async def rebuild_stats(session):
+	"""Recompute the rollup from the submission tables; returns the number of rollup rows.
+
+	Days that were already archived (see archive.py) keep their counts.
+	"""
+	# Blocks flushes until this transaction commits so no batch is counted twice or missed
+	await session.execute(text("LOCK TABLE submission_stats IN EXCLUSIVE MODE"))
+	since = await archived_before(session)
+	stale = delete(SubmissionStats)
+	await session.execute(stale.where(SubmissionStats.day >= since) if since is not None else stale)
+	for model in (Employee, Student):
+		day = _utc_date(model.created_at)
+		bucket = _age_bucket_sql(model.age) if model is Student else literal("")
+		institution_type = cast(model.institution_type, SubmissionStats.institution_type.type)
+		language = cast(model.language, SubmissionStats.language.type)
+		await session.execute(insert(SubmissionStats).from_select(
+			KEY_COLUMNS + ("count",),
+			select(day, literal(SURVEYS[model.__tablename__]), institution_type, language, bucket, func.count())
+			.where(model.created_at >= _utc_midnight(since) if since is not None else true())
+			.group_by(day, institution_type, language, bucket),
+		))
+	return (await session.execute(select(func.count()).select_from(SubmissionStats))).scalar()
+
+
+async def load_stats(session, days=14):
+	"""Totals per dimension plus submissions per day for the last ``days`` days, read from the rollup only."""
+	rows = (await session.execute(
+		select(
+			SubmissionStats.survey, SubmissionStats.institution_type, SubmissionStats.language,
+			SubmissionStats.age_bucket, func.sum(SubmissionStats.count),
+		).group_by(
+			SubmissionStats.survey, SubmissionStats.institution_type, SubmissionStats.language,
+			SubmissionStats.age_bucket,
+		)
+	)).all()
+	since = _utc_date(func.now()) - timedelta(days=days - 1)
+	per_day = (await session.execute(
+		select(SubmissionStats.day, func.sum(SubmissionStats.count))
+		.where(SubmissionStats.day >= since)
+		.group_by(SubmissionStats.day)
+		.order_by(SubmissionStats.day.desc())
+	)).all()
+
+	totals = {"survey": Counter(), "institution_type": Counter(), "language": Counter(), "age_bucket": Counter()}
+	for survey, institution_type, language, bucket, count in rows:
+		totals["survey"][survey] += count
+		totals["institution_type"][InstitutionType[institution_type].value] += count
+		totals["language"][Language[language].value] += count
+		if bucket:
+			totals["age_bucket"][bucket] += count
+	totals["per_day"] = [(day, count) for day, count in per_day]
+	return totals
+
+
+def render_stats(totals):
+	by_survey = totals["survey"]
+	buckets = [label for _, label in AGE_BUCKETS]
+	lines = [
+		f"Jami / Всего: {sum(by_survey.values())}",
+		f"Xodimlar / Сотрудники: {by_survey['employee']}, "
+		f"Tarbiyalanuvchilar / Воспитанники: {by_survey['student']}",
+		"Muassasa / Учреждение: " + ", ".join(
+			f"{value}: {totals['institution_type'][value]}" for value in (item.value for item in InstitutionType)
+		),
+		"Til / Язык: " + ", ".join(f"{value}: {totals['language'][value]}" for value in (item.value for item in Language)),
+		"Yosh / Возраст: " + ", ".join(f"{label}: {totals['age_bucket'][label]}" for label in buckets),
+		"",
+		"Kunlar bo‘yicha / По дням:",
+	]
+	lines.extend(f"{day.isoformat()}: {count}" for day, count in totals["per_day"])
+	if not totals["per_day"]:
+		lines.append("—")
+	return "\n".join(lines)
@@ -0,0 +1,190 @@
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+from aiogram.fsm.storage.redis import RedisStorage
+from sqlalchemy import func, inspect, select, delete, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database import FsmRecord
+
+dumps = partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+loads = json.loads
+
+
+class DatabaseStorage(BaseStorage):
+	"""FSM storage kept in the ``fsm_states`` table.
+
+	Works on PostgreSQL in production and on SQLite (aiosqlite) as a local stand-in.
+	``engine`` may be a function returning the engine, which is then created on first use.
+	With ``state_ttl`` (seconds), a state or data record not written for that long reads
+	as absent, like an expired Redis key, and expired rows are deleted by a write at most
+	once every ``prune_interval`` seconds.
+	"""
+
+	def __init__(self, engine, key_builder=None, owns_engine=False, state_ttl=None, prune_interval=300.0):
+		self._engine = engine
+		self.key_builder = key_builder or DefaultKeyBuilder()
+		self._owns_engine = owns_engine
+		self._state_ttl = timedelta(seconds=state_ttl) if state_ttl else None
+		self._prune_interval = prune_interval
+		self._pruned_at = 0.0
+
+	@property
+	def engine(self):
+		if not isinstance(self._engine, AsyncEngine):
+			self._engine = self._engine()
+		return self._engine
+
+	def _insert(self, table):
+		return (postgresql_insert if self.engine.dialect.name == "postgresql" else sqlite_insert)(table)
+
+	async def _write(self, conn, key, value):
+		if value is None:
+			await conn.execute(delete(FsmRecord).where(FsmRecord.key == key))
+			return
+		# Written from here rather than by the database clock, so SQLite and PostgreSQL compare alike
+		now = datetime.now(timezone.utc)
+		await conn.execute(
+			self._insert(FsmRecord).values(key=key, value=value, updated_at=now).on_conflict_do_update(
+				index_elements=[FsmRecord.key], set_={"value": value, "updated_at": now}
+			)
+		)
+
+	async def _prune(self, conn):
+		if self._state_ttl is None or time.monotonic() - self._pruned_at < self._prune_interval:
+			return
+		self._pruned_at = time.monotonic()
+		await conn.execute(delete(FsmRecord).where(FsmRecord.updated_at < datetime.now(timezone.utc) - self._state_ttl))
+
+	async def _set(self, key, value):
+		async with self.engine.begin() as conn:
+			await self._write(conn, key, value)
+			await self._prune(conn)
+
+	async def _get(self, key):
+		query = select(FsmRecord.value).where(FsmRecord.key == key)
+		if self._state_ttl is not None:
+			query = query.where(FsmRecord.updated_at >= datetime.now(timezone.utc) - self._state_ttl)
+		async with self.engine.connect() as conn:
+			return (await conn.execute(query)).scalar()
+
+	async def count_states(self):
+		query = select(FsmRecord.value, func.count()).where(
+			FsmRecord.key.endswith(f"{self.key_builder.separator}state")
+		).group_by(FsmRecord.value)
+		if self._state_ttl is not None:
+			query = query.where(FsmRecord.updated_at >= datetime.now(timezone.utc) - self._state_ttl)
+		async with self.engine.connect() as conn:
+			return Counter(dict((await conn.execute(query)).all()))
+
+	async def set_state(self, key, state=None):
+		state = state.state if isinstance(state, State) else state
+		await self._set(self.key_builder.build(key, "state"), state)
+
+	async def get_state(self, key):
+		return await self._get(self.key_builder.build(key, "state"))
+
+	async def set_data(self, key, data):
+		await self._set(self.key_builder.build(key, "data"), dumps(data) if data else None)
+
+	async def get_data(self, key):
+		data = await self._get(self.key_builder.build(key, "data"))
+		return loads(data) if data else {}
+
+	async def set_state_and_data(self, key, state, data):
+		state = state.state if isinstance(state, State) else state
+		async with self.engine.begin() as conn:
+			await self._write(conn, self.key_builder.build(key, "state"), state)
+			await self._write(conn, self.key_builder.build(key, "data"), dumps(data) if data else None)
+			await self._prune(conn)
+
+	async def close(self):
+		if self._owns_engine:
+			await self.engine.dispose()
+
+
+class BatchedRedisStorage(RedisStorage):
+	async def count_states(self, batch_size=1000):
+		separator = self.key_builder.separator
+		pattern = f"{self.key_builder.prefix}{separator}*{separator}state"
+		counts = Counter()
+		keys = []
+		async for key in self.redis.scan_iter(match=pattern, count=batch_size):
+			keys.append(key)
+			if len(keys) == batch_size:
+				counts.update(state.decode() for state in await self.redis.mget(keys) if state is not None)
+				keys = []
+		if keys:
+			counts.update(state.decode() for state in await self.redis.mget(keys) if state is not None)
+		return counts
+
+	async def set_state_and_data(self, key, state, data):
+		state = state.state if isinstance(state, State) else state
+		state_key = self.key_builder.build(key, "state")
+		data_key = self.key_builder.build(key, "data")
+		async with self.redis.pipeline(transaction=True) as pipe:
+			if state is None:
+				pipe.delete(state_key)
+			else:
+				pipe.set(state_key, state, ex=self.state_ttl)
+			if not data:
+				pipe.delete(data_key)
+			else:
+				pipe.set(data_key, self.json_dumps(data), ex=self.data_ttl)
+			await pipe.execute()
+
+
+async def count_states(storage):
+	"""Conversations in each FSM state held by ``storage``; expired ones are not counted."""
+	if isinstance(storage, MemoryStorage):
+		return Counter(record.state for record in storage.storage.values() if record.state is not None)
+	return await storage.count_states()
+
+
+def build_storage(backend, redis_url=None, sqlite_path=None, state_ttl=None):
+	"""Return ``(storage, events_isolation)`` for the configured FSM backend.
+
+	Updates of one chat are always processed one at a time, because the buffered FSM
+	context writes back whole data dicts. In-process locks are enough outside Redis:
+	workers.py routes every update of a chat to the same process.
+	"""
+	if backend == "memory":
+		return MemoryStorage(), SimpleEventIsolation()
+	if backend == "redis":
+		storage = BatchedRedisStorage.from_url(
+			redis_url,
+			state_ttl=state_ttl,
+			data_ttl=state_ttl,
+			json_loads=loads,
+			json_dumps=dumps,
+		)
+		return storage, storage.create_isolation()
+	if backend == "postgres":
+		from database import get_async_engine
+
+		return DatabaseStorage(get_async_engine, state_ttl=state_ttl), SimpleEventIsolation()
+	if backend == "sqlite":
+		from sqlalchemy import create_engine
+		from sqlalchemy.ext.asyncio import create_async_engine
+
+		os.makedirs(os.path.dirname(sqlite_path) or ".", exist_ok=True)
+		schema_engine = create_engine(f"sqlite:///{sqlite_path}")
+		FsmRecord.__table__.create(schema_engine, checkfirst=True)
+		if "updated_at" not in {column["name"] for column in inspect(schema_engine).get_columns("fsm_states")}:
+			# Files created before state expiry; SQLite cannot add a column with a non-constant default
+			with schema_engine.begin() as conn:
+				conn.execute(text("ALTER TABLE fsm_states ADD COLUMN updated_at DATETIME"))
+				conn.execute(text("UPDATE fsm_states SET updated_at = CURRENT_TIMESTAMP"))
+		schema_engine.dispose()
+		engine = create_async_engine(f"sqlite+aiosqlite:///{sqlite_path}")
+		return DatabaseStorage(engine, owns_engine=True, state_ttl=state_ttl), SimpleEventIsolation()
+	raise ValueError(f"Unknown FSM storage backend: {backend}")
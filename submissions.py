@@ -0,0 +1,274 @@
+import asyncio
+import enum
+import json
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import func, literal_column, Date, Enum
+from sqlalchemy.dialects.postgresql import insert as upsert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from database import Respondent, normalize_phone
+from stats import record_submissions
+
+logger = logging.getLogger(__name__)
+
+
+def _is_transient(error):
+	"""Whether ``error`` means the database could not be reached, as opposed to rejecting the rows."""
+	if isinstance(error, (OSError, PoolTimeoutError)):
+		return True
+	return isinstance(error, DBAPIError) and (
+		error.connection_invalidated or isinstance(error, (InterfaceError, OperationalError))
+	)
+
+
+def _encode_row(row):
+	encoded = {}
+	for key, value in row.items():
+		if isinstance(value, enum.Enum):
+			value = value.value
+		elif isinstance(value, date):
+			value = value.isoformat()
+		encoded[key] = value
+	return encoded
+
+
+def _decode_row(model, row):
+	decoded = dict(row)
+	for column in model.__table__.columns:
+		value = decoded.get(column.name)
+		if value is None:
+			continue
+		if isinstance(column.type, Enum) and column.type.enum_class is not None:
+			decoded[column.name] = column.type.enum_class(value)
+		elif isinstance(column.type, Date) and isinstance(value, str):
+			decoded[column.name] = date.fromisoformat(value)
+	return decoded
+
+
+async def _upsert_respondents(session, rows):
+	respondents = {}
+	for row in rows:
+		phone = normalize_phone(row["user_phone"])
+		respondents[phone] = dict(
+			phone=phone,
+			full_name=row["full_name"],
+			language=row["language"],
+			institution_type=row["institution_type"],
+			selfie_file_id=row.get("selfie_file_id"),
+			selfie_unique_id=row.get("selfie_unique_id"),
+		)
+	stmt = upsert(Respondent).values(list(respondents.values()))
+	stmt = stmt.on_conflict_do_update(
+		index_elements=[Respondent.phone],
+		set_={
+			"full_name": stmt.excluded.full_name,
+			"language": stmt.excluded.language,
+			"institution_type": stmt.excluded.institution_type,
+			"selfie_file_id": func.coalesce(stmt.excluded.selfie_file_id, Respondent.selfie_file_id),
+			"selfie_unique_id": func.coalesce(stmt.excluded.selfie_unique_id, Respondent.selfie_unique_id),
+		},
+	).returning(Respondent.id, Respondent.phone)
+	return {phone: respondent_id for respondent_id, phone in (await session.execute(stmt)).all()}
+
+
+async def _upsert_submissions(session, model, rows):
+	"""Insert ``rows`` or refresh the matching submission; returns the rows that were new.
+
+	A submission is identified by its normalized phone, full name and date of birth, so
+	a user who starts over and fills in the same teacher or child updates the earlier
+	row instead of adding another one. A resubmission without a selfie keeps the old one.
+	"""
+	latest = {}
+	for row in rows:
+		latest[(row["user_phone"], row["full_name"], row["date_of_birth"])] = row
+	stmt = upsert(model).values(list(latest.values()))
+	updated = {
+		name: stmt.excluded[name] for name in next(iter(latest.values()))
+		if name not in ("user_phone", "full_name", "date_of_birth")
+	}
+	for name in ("selfie_file_id", "selfie_unique_id"):
+		updated[name] = func.coalesce(stmt.excluded[name], model.__table__.c[name])
+	updated["updated_at"] = func.now()
+	stmt = stmt.on_conflict_do_update(
+		index_elements=[model.user_phone, model.full_name, model.date_of_birth], set_=updated,
+	).returning(model.user_phone, model.full_name, model.date_of_birth, literal_column("xmax = 0"))
+	# xmax is zero only for rows created by this statement
+	return [
+		latest[(phone, full_name, date_of_birth)]
+		for phone, full_name, date_of_birth, inserted in (await session.execute(stmt)).all() if inserted
+	]
+
+
+class SubmissionQueue:
+	"""Write-behind buffer for completed surveys.
+
+	Handlers enqueue rows and reply immediately; a background task upserts the
+	respondents of a batch and then the rows themselves once ``batch_size`` rows are
+	waiting or ``flush_interval`` seconds have passed; the statistics rollup is
+	updated in the same transaction.
+	Rows that cannot be written because the database is unreachable are appended to
+	``spill_path`` and replayed in batches once it accepts writes again. When the
+	database rejects a batch, its rows are retried one at a time and the rejected ones
+	go to the dead-letter file next to the spill (``*.dead.jsonl``) instead of blocking
+	the rest. ``on_flush`` is called with the ids of the respondents whose submissions
+	were just committed.
+	"""
+
+	def __init__(self, session_factory, models, spill_path, batch_size=100, flush_interval=2.0, on_flush=None):
+		self._session_factory = session_factory
+		self._on_flush = on_flush
+		self._models = {model.__tablename__: model for model in models}
+		self._spill_path = spill_path
+		root, ext = os.path.splitext(spill_path)
+		self._dead_letter_path = f"{root}.dead{ext}"
+		self._batch_size = batch_size
+		self._flush_interval = flush_interval
+		self._queue = asyncio.Queue()
+		self._task = None
+		self._spill_pending = os.path.exists(spill_path) and os.path.getsize(spill_path) > 0
+
+	def put(self, model, row):
+		if self._task is None or self._task.done():
+			raise RuntimeError("Submission queue is not running")
+		self._queue.put_nowait((model.__tablename__, row))
+
+	@property
+	def depth(self):
+		return self._queue.qsize()
+
+	async def start(self):
+		if self._spill_pending:
+			await self._replay_spill()
+		self._task = asyncio.create_task(self._run())
+
+	async def stop(self):
+		if self._task is None:
+			return
+		self._queue.put_nowait(None)
+		await self._task
+		self._task = None
+		logger.info("Submission queue drained")
+
+	async def _run(self):
+		loop = asyncio.get_running_loop()
+		closing = False
+		while not closing:
+			item = await self._queue.get()
+			if item is None:
+				break
+			batch = [item]
+			deadline = loop.time() + self._flush_interval
+			while len(batch) < self._batch_size:
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					item = await asyncio.wait_for(self._queue.get(), timeout)
+				except asyncio.TimeoutError:
+					break
+				if item is None:
+					closing = True
+					break
+				batch.append(item)
+			await self._flush(batch)
+
+	async def _write(self, batch):
+		batch = [(table, {**row, "user_phone": normalize_phone(row["user_phone"])}) for table, row in batch]
+		async with self._session_factory() as session:
+			respondent_ids = await _upsert_respondents(session, [row for _, row in batch])
+			grouped = {}
+			for table, row in batch:
+				grouped.setdefault(table, []).append({**row, "respondent_id": respondent_ids[row["user_phone"]]})
+			inserted = []
+			for table, rows in grouped.items():
+				inserted.extend((table, row) for row in await _upsert_submissions(session, self._models[table], rows))
+			await record_submissions(session, inserted)
+			await session.commit()
+		if self._on_flush is not None:
+			self._on_flush(set(respondent_ids.values()))
+
+	async def _deliver(self, batch):
+		"""Write ``batch``, dead-lettering rows the database rejects; returns the rows left unwritten by an outage."""
+		try:
+			await self._write(batch)
+			return []
+		except Exception as e:
+			if _is_transient(e):
+				logger.error(f"Failed to write {len(batch)} submissions: {str(e)}")
+				return batch
+			if len(batch) == 1:
+				self._dead_letter(batch, e)
+				return []
+			logger.warning(f"Batch of {len(batch)} submissions rejected, writing them one at a time: {str(e)}")
+		for index, item in enumerate(batch):
+			try:
+				await self._write([item])
+			except Exception as e:
+				if _is_transient(e):
+					logger.error(f"Failed to write {len(batch) - index} submissions: {str(e)}")
+					return batch[index:]
+				self._dead_letter([item], e)
+		return []
+
+	async def _flush(self, batch):
+		unwritten = await self._deliver(batch)
+		if unwritten:
+			logger.error(f"Spilling {len(unwritten)} submissions to {self._spill_path}")
+			self._spill(unwritten)
+			return
+		logger.info(f"Saved {len(batch)} submissions")
+		if self._spill_pending:
+			await self._replay_spill()
+
+	def _append(self, path, entries):
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(path, "a", encoding="utf-8") as output:
+			for entry in entries:
+				output.write(json.dumps(entry, ensure_ascii=False) + "\n")
+			output.flush()
+			os.fsync(output.fileno())
+
+	def _spill(self, batch):
+		self._append(self._spill_path, ({"table": table, "row": _encode_row(row)} for table, row in batch))
+		self._spill_pending = True
+
+	def _dead_letter(self, batch, error):
+		logger.error(
+			f"Database rejected {len(batch)} submission(s), moving to {self._dead_letter_path}: {str(error)}"
+		)
+		self._append(self._dead_letter_path, (
+			{"table": table, "row": _encode_row(row), "error": str(error)} for table, row in batch
+		))
+
+	async def _replay_spill(self):
+		batch = []
+		with open(self._spill_path, encoding="utf-8") as spill:
+			for line in spill:
+				if not line.strip():
+					continue
+				try:
+					entry = json.loads(line)
+					batch.append((entry["table"], _decode_row(self._models[entry["table"]], entry["row"])))
+				except (ValueError, KeyError) as e:
+					logger.error(f"Unreadable spilled submission, moving to {self._dead_letter_path}: {str(e)}")
+					self._append(self._dead_letter_path, ({"line": line.rstrip("\n"), "error": str(e)},))
+
+		for start in range(0, len(batch), self._batch_size):
+			unwritten = await self._deliver(batch[start:start + self._batch_size])
+			if unwritten:
+				# Keep only what is still owed; the committed chunks must not be replayed again
+				remaining = unwritten + batch[start + self._batch_size:]
+				replacement = f"{self._spill_path}.tmp"
+				open(replacement, "w").close()
+				self._append(replacement, ({"table": table, "row": _encode_row(row)} for table, row in remaining))
+				os.replace(replacement, self._spill_path)
+				logger.warning(f"{len(remaining)} spilled submissions still cannot be written")
+				return
+		open(self._spill_path, "w").close()
+		self._spill_pending = False
+		logger.info(f"Replayed {len(batch)} spilled submissions")
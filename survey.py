@@ -0,0 +1,148 @@
+from aiogram.filters import Filter
+
+from database import Employee, Student
+from states import EmployeeForm, StudentForm
+from validators import required_text, iso_date, positive_int, email, normalize_phone, parse_date
+
+DATE_ERROR = {
+	"uz": "Iltimos, sanani to‘g‘ri formatda kiriting (yil-oy-kun).",
+	"ru": "Пожалуйста, введите дату в правильном формате (год-месяц-день).",
+}
+EMAIL_ERROR = {
+	"uz": "Iltimos, to‘g‘ri elektron pochta kiriting (masalan, example@domain.com).",
+	"ru": "Пожалуйста, введите корректный адрес электронной почты (например, example@domain.com).",
+}
+
+
+class Step:
+	"""One question: the FSM state it is asked in, the reply validator and where the answer is stored.
+
+	``validate`` returns the value to keep in FSM data or raises ``ValueError``.
+	"""
+
+	def __init__(self, state, key, prompt, error, validate=required_text):
+		self.state = state
+		self.key = key
+		self.prompt = prompt
+		self.error = error
+		self.validate = validate
+
+
+class Survey:
+	"""A linear questionnaire whose answers become one row of ``model`` once the last step is answered."""
+
+	def __init__(self, name, model, choice, steps, build_row):
+		self.name = name
+		self.model = model
+		self.choice = choice
+		self.steps = steps
+		self.build_row = build_row
+
+	@property
+	def first(self):
+		return self.steps[0]
+
+
+def _employee_row(data):
+	position = data["position"]
+	return dict(
+		full_name=data["full_name"],
+		date_of_birth=parse_date(data["date_of_birth"]),
+		address=data["address"],
+		email=data["email"],
+		position=position,
+		subject=position if "o‘qituvchi" in position.lower() or "преподаватель" in position.lower() else None,
+		start_date=parse_date(data["start_date"]),
+	)
+
+
+def _student_row(data):
+	return dict(
+		full_name=data["full_name"],
+		date_of_birth=parse_date(data["date_of_birth"]),
+		age=int(data["age"]),
+		address=data["address"],
+		diagnosis=data["diagnosis"],
+		attendance_days=data["attendance_days"],
+		parent_name=data["parent_name"],
+		parent_email=data["parent_email"],
+		parent_phone=data["parent_phone"],
+	)
+
+
+EMPLOYEE_SURVEY = Survey("employee", Employee, "Xodim (O‘qituvchi) / Сотрудник (Преподаватель)", (
+	Step(EmployeeForm.full_name, "full_name",
+		 {"uz": "To‘liq ism, familiyangiz?:", "ru": "Введите ваше полное имя:"},
+		 {"uz": "Iltimos, to‘liq ismni kiriting.", "ru": "Пожалуйста, введите полное имя."}),
+	Step(EmployeeForm.date_of_birth, "date_of_birth",
+		 {"uz": "Tug‘ilgan sanangiz? (yil-oy-kun):", "ru": "Дата рождения? (год-месяц-день):"},
+		 DATE_ERROR, iso_date),
+	Step(EmployeeForm.address, "address",
+		 {"uz": "Yashash manzilingiz?:", "ru": "Адрес проживания?:"},
+		 {"uz": "Iltimos, manzilni kiriting.", "ru": "Пожалуйста, введите адрес."}),
+	Step(EmployeeForm.email, "email",
+		 {"uz": "Elektron pochtangiz?:", "ru": "Электронная почта?:"},
+		 EMAIL_ERROR, email),
+	Step(EmployeeForm.position, "position",
+		 {"uz": "Lavozimingiz va fan (agar o‘qituvchi bo‘lsangiz)?:",
+		  "ru": "Ваша должность и предмет (если вы преподаватель)?:"},
+		 {"uz": "Iltimos, lavozimni kiriting.", "ru": "Пожалуйста, введите должность."}),
+	Step(EmployeeForm.start_date, "start_date",
+		 {"uz": "Ish boshlagan sanangiz? (yil-oy-kun):", "ru": "Дата начала работы? (год-месяц-день):"},
+		 DATE_ERROR, iso_date),
+), _employee_row)
+
+STUDENT_SURVEY = Survey("student", Student, "Tarbiyalanuvchi / Воспитанник", (
+	Step(StudentForm.full_name, "full_name",
+		 {"uz": "Bola ismi va familiyasi?:", "ru": "Имя и фамилия ребёнка?:"},
+		 {"uz": "Iltimos, bola ismi va familiyasini kiriting.", "ru": "Пожалуйста, введите имя и фамилию ребёнка."}),
+	Step(StudentForm.date_of_birth, "date_of_birth",
+		 {"uz": "Tug‘ilgan sanasi? (yil-oy-kun):", "ru": "Дата рождения? (год-месяц-день):"},
+		 DATE_ERROR, iso_date),
+	Step(StudentForm.age, "age",
+		 {"uz": "Yoshi?:", "ru": "Возраст?:"},
+		 {"uz": "Iltimos, yoshni to‘g‘ri raqamda kiriting.", "ru": "Пожалуйста, введите возраст корректным числом."},
+		 positive_int),
+	Step(StudentForm.address, "address",
+		 {"uz": "Yashash manzili?:", "ru": "Адрес проживания?:"},
+		 {"uz": "Iltimos, manzilni kiriting.", "ru": "Пожалуйста, введите адрес."}),
+	Step(StudentForm.diagnosis, "diagnosis",
+		 {"uz": "Diagnozi qanday?:", "ru": "Какой диагноз у ребёнка?:"},
+		 {"uz": "Iltimos, diagnozni kiriting.", "ru": "Пожалуйста, введите диагноз."}),
+	Step(StudentForm.attendance_days, "attendance_days",
+		 {"uz": "Haftaning qaysi kunlari qatnashadi?:", "ru": "В какие дни посещает?:"},
+		 {"uz": "Iltimos, qatnashadigan kunlarni kiriting.", "ru": "Пожалуйста, введите дни посещения."}),
+	Step(StudentForm.parent_name, "parent_name",
+		 {"uz": "Ota-ona yoki vasiy ismi?:", "ru": "Имя родителя или опекуна?:"},
+		 {"uz": "Iltimos, ota-ona yoki vasiy ismini kiriting.", "ru": "Пожалуйста, введите имя родителя или опекуна."}),
+	Step(StudentForm.parent_email, "parent_email",
+		 {"uz": "Elektron pochta?:", "ru": "Электронная почта?:"},
+		 EMAIL_ERROR, email),
+	Step(StudentForm.parent_phone, "parent_phone",
+		 {"uz": "Telefon raqami?:", "ru": "Контактный номер телефона?:"},
+		 {"uz": "Iltimos, to‘g‘ri telefon raqamini kiriting (10-15 raqam, + bilan yoki bilansiz).",
+		  "ru": "Пожалуйста, введите корректный номер телефона (10-15 цифр, с + или без)."},
+		 normalize_phone),
+), _student_row)
+
+SURVEYS = (EMPLOYEE_SURVEY, STUDENT_SURVEY)
+
+# Survey picked by its keyboard button text.
+SURVEY_CHOICES = {survey.choice: survey for survey in SURVEYS}
+
+# FSM state name -> (survey, step, next step or None), so resolving the current step is a single lookup.
+STEPS = {
+	step.state.state: (survey, step, survey.steps[i + 1] if i + 1 < len(survey.steps) else None)
+	for survey in SURVEYS
+	for i, step in enumerate(survey.steps)
+}
+
+
+class SurveyStep(Filter):
+	"""Matches when the user is in any survey step and passes it to the handler as ``survey_step``."""
+
+	async def __call__(self, message, raw_state=None):
+		entry = STEPS.get(raw_state)
+		if entry is None:
+			return False
+		return {"survey_step": entry}
@@ -0,0 +1,8 @@
+import os
+
+# config.py reads these at import; no test opens a connection or calls the Bot API
+for name, value in dict(
+	BOT_TOKEN="123456:test", ADMIN_ID="1", DB_USER="test", DB_PASSWORD="test", DB_HOST="localhost",
+	DB_PORT="5432", DB_NAME="test", FSM_STORAGE="memory", METRICS_PORT="0",
+).items():
+	os.environ.setdefault(name, value)
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = SimpleNamespace(now=1000.0)
+	monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+	return clock
+
+
+def test_entries_expire_after_ttl(clock):
+	entries = TTLCache(maxsize=10, ttl=5)
+	entries.set("a", 1)
+	clock.now += 5
+	assert entries.get("a") == 1
+	clock.now += 0.1
+	assert entries.get("a", "missing") == "missing"
+	assert entries.stats()["size"] == 0
+
+
+def test_evicts_least_recently_used(clock):
+	entries = TTLCache(maxsize=2, ttl=60)
+	entries.set("a", 1)
+	entries.set("b", 2)
+	assert entries.get("a") == 1
+	entries.set("c", 3)
+	assert entries.get("b") is None
+	assert entries.get("a") == 1
+	assert entries.get("c") == 3
+	assert entries.stats()["evictions"] == 1
+
+
+def test_pop_clear_and_stats(clock):
+	entries = TTLCache(maxsize=10, ttl=60)
+	entries.set("a", 1)
+	entries.set("b", 2)
+	entries.pop("a")
+	entries.pop("missing")
+	assert entries.get("a") is None
+	assert entries.get("b") == 2
+	entries.clear()
+	assert entries.get("b") is None
+	assert entries.stats() == {
+		"size": 0, "maxsize": 10, "hits": 1, "misses": 2, "evictions": 0, "hit_rate": 1 / 3,
+	}
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetFile, SendMessage
+
+from outbound import SendScheduler
+
+
+def flood_limited(times, retry_after):
+	"""A make_request that answers 429 ``times`` times, then succeeds; records when it was called."""
+	calls = []
+
+	async def make_request(bot, method):
+		calls.append(time.monotonic())
+		if len(calls) <= times:
+			raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=retry_after)
+		return "sent"
+
+	return make_request, calls
+
+
+def test_retries_after_429_once_the_chat_pause_is_over():
+	scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=3)
+	make_request, calls = flood_limited(times=2, retry_after=0.1)
+
+	assert asyncio.run(scheduler(make_request, None, SendMessage(chat_id=5, text="hi"))) == "sent"
+	assert len(calls) == 3
+	assert calls[1] - calls[0] >= 0.09
+	assert calls[2] - calls[1] >= 0.09
+	assert scheduler.stats()["retries"] == 2
+	assert scheduler.stats()["sent"] == 1
+
+
+def test_gives_up_after_max_retries():
+	scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=1)
+	make_request, calls = flood_limited(times=5, retry_after=0.01)
+
+	with pytest.raises(TelegramRetryAfter):
+		asyncio.run(scheduler(make_request, None, SendMessage(chat_id=5, text="hi")))
+	assert len(calls) == 2
+
+
+def test_pause_applies_to_the_limited_chat_only():
+	scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=10)
+	scheduler._pause(5, 10)
+
+	async def make_request(bot, method):
+		return method.chat_id
+
+	async def scenario():
+		assert await asyncio.wait_for(scheduler(make_request, None, SendMessage(chat_id=6, text="hi")), 1) == 6
+		with pytest.raises(asyncio.TimeoutError):
+			await asyncio.wait_for(scheduler(make_request, None, SendMessage(chat_id=5, text="hi")), 0.1)
+
+	asyncio.run(scenario())
+
+
+def test_calls_without_a_chat_are_not_paced():
+	scheduler = SendScheduler(global_rate=1, chat_rate=1, chat_burst=1)
+	make_request, calls = flood_limited(times=0, retry_after=0)
+
+	async def scenario():
+		for _ in range(5):
+			await asyncio.wait_for(scheduler(make_request, None, GetFile(file_id="x")), 0.1)
+
+	asyncio.run(scenario())
+	assert len(calls) == 5
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from main import split_message
+
+
+def test_short_text_is_one_chunk():
+	assert split_message("one\n\ntwo", limit=100) == ["one\n\ntwo"]
+
+
+def test_blank_text_gives_no_chunks():
+	assert split_message("") == []
+	assert split_message("\n\n \n\n") == []
+
+
+def test_paragraphs_are_packed_up_to_the_limit():
+	assert split_message("aaaa\n\nbbbb\n\ncc", limit=10) == ["aaaa\n\nbbbb", "cc"]
+
+
+def test_long_paragraph_is_cut_at_a_space():
+	assert split_message("one two three four", limit=9) == ["one two", "three", "four"]
+
+
+def test_long_word_is_cut_at_the_limit():
+	assert split_message("x" * 25, limit=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_are_within_bounds_and_never_blank(seed):
+	rng = random.Random(seed)
+	text = "".join(rng.choice("ab \n") for _ in range(rng.randint(0, 500)))
+	chunks = split_message(text, limit=17)
+	for chunk in chunks:
+		assert chunk.strip()
+		assert len(chunk) <= 17
+		assert not chunk.endswith("\n")
+	assert "".join(chunks).replace("\n", "").replace(" ", "") == text.replace("\n", "").replace(" ", "")
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import update
+
+from database import FsmRecord
+from storage import build_storage, count_states
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def sqlite_storage(tmp_path, state_ttl=None):
+	storage, isolation = build_storage("sqlite", sqlite_path=str(tmp_path / "fsm.sqlite3"), state_ttl=state_ttl)
+	assert isolation is not None
+	return storage
+
+
+async def age(storage, seconds):
+	async with storage.engine.begin() as conn:
+		await conn.execute(update(FsmRecord).values(updated_at=datetime.now(timezone.utc) - timedelta(seconds=seconds)))
+
+
+def test_state_and_data_round_trip(tmp_path):
+	storage = sqlite_storage(tmp_path)
+
+	async def scenario():
+		await storage.set_state_and_data(KEY, "Survey:name", {"lang_text": "uz", "name": "Ali"})
+		assert await storage.get_state(KEY) == "Survey:name"
+		assert await storage.get_data(KEY) == {"lang_text": "uz", "name": "Ali"}
+		await storage.set_state_and_data(KEY, None, {})
+		assert await storage.get_state(KEY) is None
+		assert await storage.get_data(KEY) == {}
+		await storage.close()
+
+	asyncio.run(scenario())
+
+
+def test_records_expire_after_state_ttl_and_are_pruned(tmp_path):
+	storage = sqlite_storage(tmp_path, state_ttl=60)
+	storage._prune_interval = 0
+	other = StorageKey(bot_id=1, chat_id=11, user_id=11)
+
+	async def scenario():
+		await storage.set_state(KEY, "Survey:name")
+		await storage.set_data(KEY, {"name": "Ali"})
+		await age(storage, 61)
+		assert await storage.get_state(KEY) is None
+		assert await storage.get_data(KEY) == {}
+		await storage.set_state(other, "Survey:email")
+		async with storage.engine.connect() as conn:
+			keys = (await conn.execute(FsmRecord.__table__.select())).all()
+		await storage.close()
+		return [row.key for row in keys]
+
+	assert asyncio.run(scenario()) == [storage.key_builder.build(other, "state")]
+
+
+def test_without_ttl_records_do_not_expire(tmp_path):
+	storage = sqlite_storage(tmp_path)
+
+	async def scenario():
+		await storage.set_state(KEY, "Survey:name")
+		await age(storage, 10 ** 6)
+		state = await storage.get_state(KEY)
+		await storage.close()
+		return state
+
+	assert asyncio.run(scenario()) == "Survey:name"
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_count_states_skips_finished_and_expired_conversations(tmp_path, backend):
+	if backend == "sqlite":
+		storage = sqlite_storage(tmp_path, state_ttl=60)
+	else:
+		storage, _ = build_storage("memory")
+
+	async def scenario():
+		for user_id, state in ((1, "Survey:name"), (2, "Survey:name"), (3, "Survey:email"), (4, None)):
+			key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+			await storage.set_state(key, state)
+			await storage.set_data(key, {"lang_text": "uz"})
+		counts = await count_states(storage)
+		if backend == "sqlite":
+			await age(storage, 61)
+			assert await count_states(storage) == {}
+		await storage.close()
+		return counts
+
+	assert asyncio.run(scenario()) == {"Survey:name": 2, "Survey:email": 1}
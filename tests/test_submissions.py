@@ -0,0 +1,146 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+
+from database import Employee, InstitutionType, Language
+from submissions import SubmissionQueue, _is_transient
+
+
+class FakeDatabase:
+	"""Stands in for the upserts: refuses everything while down and rejects rows named ``bad``."""
+
+	def __init__(self):
+		self.down = False
+		self.rows = []
+
+	async def write(self, batch):
+		if self.down:
+			raise OperationalError("INSERT", {}, ConnectionRefusedError("connection refused"))
+		for _, row in batch:
+			if row["full_name"] == "bad":
+				raise IntegrityError("INSERT", {}, Exception("violates check constraint"))
+		self.rows.extend(row for _, row in batch)
+
+
+class FakeQueue(SubmissionQueue):
+	def __init__(self, database, spill_path, batch_size=3):
+		super().__init__(None, (Employee,), str(spill_path), batch_size=batch_size)
+		self.database = database
+
+	async def _write(self, batch):
+		await self.database.write(batch)
+
+
+def employee(name):
+	return (Employee.__tablename__, dict(
+		full_name=name, date_of_birth=date(1990, 1, 1), start_date=date(2020, 9, 1), language=Language.UZBEK,
+		institution_type=InstitutionType.MARKAZ, user_phone="+998901234567",
+	))
+
+
+def lines(path):
+	return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] if path.exists() else []
+
+
+def test_spills_during_outage_and_replays_after_recovery(tmp_path):
+	database = FakeDatabase()
+	spill = tmp_path / "submissions.spill.jsonl"
+	queue = FakeQueue(database, spill)
+
+	async def scenario():
+		database.down = True
+		await queue._flush([employee("a"), employee("b")])
+		await queue._flush([employee("c")])
+		assert [entry["row"]["full_name"] for entry in lines(spill)] == ["a", "b", "c"]
+		database.down = False
+		await queue._flush([employee("d")])
+
+	asyncio.run(scenario())
+	assert [row["full_name"] for row in database.rows] == ["d", "a", "b", "c"]
+	# Spilled rows come back with their enums and dates
+	assert database.rows[1] == employee("a")[1]
+	assert spill.read_text() == ""
+	assert not queue._spill_pending
+
+
+def test_replays_a_pending_spill_on_start(tmp_path):
+	database = FakeDatabase()
+	spill = tmp_path / "submissions.spill.jsonl"
+	database.down = True
+	asyncio.run(FakeQueue(database, spill)._flush([employee("a")]))
+
+	database.down = False
+	queue = FakeQueue(database, spill)
+	assert queue._spill_pending
+
+	async def scenario():
+		await queue.start()
+		await queue.stop()
+
+	asyncio.run(scenario())
+	assert [row["full_name"] for row in database.rows] == ["a"]
+	assert spill.read_text() == ""
+
+
+def test_rejected_row_goes_to_dead_letter_and_the_rest_is_written(tmp_path):
+	database = FakeDatabase()
+	spill = tmp_path / "submissions.spill.jsonl"
+	queue = FakeQueue(database, spill)
+
+	asyncio.run(queue._flush([employee("a"), employee("bad"), employee("b")]))
+
+	assert [row["full_name"] for row in database.rows] == ["a", "b"]
+	dead = lines(tmp_path / "submissions.spill.dead.jsonl")
+	assert [entry["row"]["full_name"] for entry in dead] == ["bad"]
+	assert "check constraint" in dead[0]["error"]
+	assert not spill.exists()
+
+
+def test_outage_during_replay_keeps_only_unwritten_rows(tmp_path):
+	database = FakeDatabase()
+	spill = tmp_path / "submissions.spill.jsonl"
+	queue = FakeQueue(database, spill, batch_size=2)
+	database.down = True
+	asyncio.run(queue._flush([employee(name) for name in "abcde"]))
+
+	written = []
+
+	async def fail_after_first_chunk(batch):
+		if written:
+			raise OperationalError("INSERT", {}, ConnectionResetError("connection reset"))
+		written.extend(row["full_name"] for _, row in batch)
+
+	database.down = False
+	database.write = fail_after_first_chunk
+	asyncio.run(queue._replay_spill())
+
+	assert written == ["a", "b"]
+	assert [entry["row"]["full_name"] for entry in lines(spill)] == ["c", "d", "e"]
+	assert queue._spill_pending
+
+
+def test_unreadable_spill_line_goes_to_dead_letter(tmp_path):
+	database = FakeDatabase()
+	spill = tmp_path / "submissions.spill.jsonl"
+	database.down = True
+	queue = FakeQueue(database, spill)
+	asyncio.run(queue._flush([employee("a")]))
+	with open(spill, "a", encoding="utf-8") as output:
+		output.write("{not json\n")
+
+	database.down = False
+	asyncio.run(queue._replay_spill())
+
+	assert [row["full_name"] for row in database.rows] == ["a"]
+	assert [entry["line"] for entry in lines(tmp_path / "submissions.spill.dead.jsonl")] == ["{not json"]
+
+
+def test_is_transient():
+	assert _is_transient(OperationalError("SELECT 1", {}, Exception()))
+	assert _is_transient(ConnectionRefusedError())
+	invalidated = DBAPIError("SELECT 1", {}, Exception(), connection_invalidated=True)
+	assert _is_transient(invalidated)
+	assert not _is_transient(IntegrityError("INSERT", {}, Exception()))
+	assert not _is_transient(ValueError("invalid phone"))
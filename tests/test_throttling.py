@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import User
+
+import middlewares
+from middlewares import ThrottlingMiddleware
+
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def monotonic(self):
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(middlewares, "time", SimpleNamespace(monotonic=clock.monotonic))
+	return clock
+
+
+def send(throttle, user_id):
+	handled = []
+
+	async def handler(event, data):
+		handled.append(event)
+		return "handled"
+
+	data = {"event_from_user": User(id=user_id, is_bot=False, first_name="Test")}
+	return asyncio.run(throttle(handler, object(), data)) == "handled"
+
+
+def test_drops_beyond_the_burst_and_refills(clock):
+	throttle = ThrottlingMiddleware(rate=1, burst=2)
+	assert [send(throttle, 1) for _ in range(3)] == [True, True, False]
+	assert throttle.dropped == 1
+	clock.now += 1
+	assert send(throttle, 1)
+	assert not send(throttle, 1)
+
+
+def test_users_have_separate_buckets_and_exempt_users_are_not_limited(clock):
+	throttle = ThrottlingMiddleware(rate=1, burst=1, exempt={9})
+	assert send(throttle, 1)
+	assert send(throttle, 2)
+	assert not send(throttle, 1)
+	assert all(send(throttle, 9) for _ in range(5))
+	assert len(throttle) == 2
+
+
+def test_evicts_least_recently_seen_beyond_max_users(clock):
+	throttle = ThrottlingMiddleware(rate=1, burst=1, max_users=2)
+	for user_id in (1, 2, 3):
+		assert send(throttle, user_id)
+	assert len(throttle) == 2
+	# User 1 was evicted, so it starts again with a full bucket; user 3 is still empty
+	assert send(throttle, 1)
+	assert not send(throttle, 3)
+
+
+def test_evicts_idle_buckets(clock):
+	throttle = ThrottlingMiddleware(rate=0.001, burst=1, idle_ttl=60)
+	assert send(throttle, 1)
+	clock.now += 61
+	assert send(throttle, 2)
+	assert len(throttle) == 1
+	assert send(throttle, 1)
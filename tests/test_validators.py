@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+from validators import email, normalize_phone, parse_date, validate_batch
+
+
+@pytest.mark.parametrize("text", [
+	"+998901234567", "998901234567", "00998901234567", "+998 90 123-45-67", "(998) 90.123.45.67",
+])
+def test_normalize_phone_canonical_e164(text):
+	assert normalize_phone(text) == "+998901234567"
+
+
+@pytest.mark.parametrize("text", [
+	"0901234567",        # national number with a trunk 0
+	"+0901234567",
+	"+00998901234567",   # + and 00 together
+	"12345",
+	"+9989012345678901",
+	"99890123456a",
+	"",
+])
+def test_normalize_phone_rejects(text):
+	with pytest.raises(ValueError):
+		normalize_phone(text)
+
+
+def test_parse_date():
+	assert parse_date("2020-02-29") == date(2020, 2, 29)
+
+
+@pytest.mark.parametrize("text", ["2021-02-29", "2020-2-9", "20200229", "2020-02-29T00:00", "29.02.2020"])
+def test_parse_date_rejects(text):
+	with pytest.raises(ValueError):
+		parse_date(text)
+
+
+def test_email_lowercases_the_domain_only():
+	assert email(" Ali.Valiyev@Example.UZ ") == "Ali.Valiyev@example.uz"
+	with pytest.raises(ValueError):
+		email("ali@example")
+
+
+def test_validate_batch_reports_rejects_by_index():
+	cleaned, errors = validate_batch(normalize_phone, ["998901234567", "0901234567", "+998 90 765 43 21"])
+	assert cleaned == ["+998901234567", None, "+998907654321"]
+	assert errors == {1: "invalid phone"}
@@ -0,0 +1,43 @@
+"""Move old employees and students rows into the submission_archive table.
+
+Rows created before the first day of the month ARCHIVE_AFTER_MONTHS months ago (UTC)
+are grouped per table and calendar month into single compressed JSON entries and
+deleted from the live tables, which keeps their BRIN indexes and scans small. The
+statistics rollup keeps counting the archived rows.
+
+	python tools/archive_submissions.py               # use ARCHIVE_AFTER_MONTHS
+	python tools/archive_submissions.py --months 6
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import archive_cutoff, archive_submissions
+from config import ARCHIVE_AFTER_MONTHS
+from database import AsyncSessionLocal, async_engine
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS,
+						help="keep this many calendar months before the current one")
+	args = parser.parse_args()
+
+	before = archive_cutoff(args.months)
+	started = time.perf_counter()
+	try:
+		async with AsyncSessionLocal() as session:
+			moved = await archive_submissions(session, before)
+			await session.commit()
+	finally:
+		await async_engine.dispose()
+	summary = ", ".join(f"{table}: {count}" for table, count in moved.items())
+	print(f"archived rows created before {before.isoformat()} ({summary}) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,149 @@
+"""Handler latency under concurrent submissions: sync SessionLocal vs AsyncSessionLocal.
+
+Runs N concurrent simulated survey completions against the configured database while a
+probe coroutine plays the part of the other users mid-survey and records how late the
+event loop schedules it. Each submission stores its respondent first, as the bot does;
+rows are tagged and removed after every run.
+
+	python tools/bench_db_latency.py --submissions 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete
+
+from database import SessionLocal, AsyncSessionLocal, async_engine, Employee, Respondent, Language, InstitutionType
+
+MARKER = "__bench_db_latency__"
+PROBE_INTERVAL = 0.01
+
+
+# Operator code 00 is not issued, so these numbers cannot collide with real respondents
+def bench_phone(i):
+	return f"+998000{i:07d}"
+
+
+def make_respondent(i):
+	return Respondent(
+		phone=bench_phone(i),
+		full_name=f"{MARKER} {i}",
+		language=Language.UZBEK,
+		institution_type=InstitutionType.BOGCHA_MAKTAB,
+	)
+
+
+def make_employee(i, respondent_id):
+	return Employee(
+		full_name=f"{MARKER} {i}",
+		date_of_birth=date(1990, 1, 1),
+		address="bench",
+		email="bench@example.com",
+		position="bench",
+		start_date=date(2020, 1, 1),
+		language=Language.UZBEK,
+		user_phone=bench_phone(i),
+		institution_type=InstitutionType.BOGCHA_MAKTAB,
+		respondent_id=respondent_id,
+	)
+
+
+async def save_sync(i):
+	with SessionLocal() as session:
+		respondent = make_respondent(i)
+		session.add(respondent)
+		session.flush()
+		session.add(make_employee(i, respondent.id))
+		session.commit()
+
+
+async def save_async(i):
+	async with AsyncSessionLocal() as session:
+		respondent = make_respondent(i)
+		session.add(respondent)
+		await session.flush()
+		session.add(make_employee(i, respondent.id))
+		await session.commit()
+
+
+def percentile(values, pct):
+	if not values:
+		return 0.0
+	values = sorted(values)
+	index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+	return values[index]
+
+
+async def probe(lags, stop):
+	while not stop.is_set():
+		expected = time.perf_counter() + PROBE_INTERVAL
+		await asyncio.sleep(PROBE_INTERVAL)
+		lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(save, submissions, concurrency):
+	semaphore = asyncio.Semaphore(concurrency)
+	latencies, lags = [], []
+	stop = asyncio.Event()
+
+	async def submit(i):
+		async with semaphore:
+			started = time.perf_counter()
+			await save(i)
+			latencies.append(time.perf_counter() - started)
+
+	probe_task = asyncio.create_task(probe(lags, stop))
+	started = time.perf_counter()
+	await asyncio.gather(*(submit(i) for i in range(submissions)))
+	elapsed = time.perf_counter() - started
+	stop.set()
+	await probe_task
+	return latencies, lags, elapsed
+
+
+def report(name, latencies, lags, elapsed):
+	print(f"{name}:")
+	print(f"  throughput     {len(latencies) / elapsed:8.1f} submissions/s")
+	print(
+		f"  handler ms     p50={percentile(latencies, 50) * 1000:7.2f} "
+		f"p99={percentile(latencies, 99) * 1000:7.2f} mean={statistics.fmean(latencies) * 1000:7.2f}"
+	)
+	print(
+		f"  other users ms p50={percentile(lags, 50) * 1000:7.2f} "
+		f"p99={percentile(lags, 99) * 1000:7.2f} max={max(lags, default=0) * 1000:7.2f}"
+	)
+
+
+async def cleanup():
+	async with AsyncSessionLocal() as session:
+		await session.execute(delete(Employee).where(Employee.full_name.startswith(MARKER)))
+		await session.execute(delete(Respondent).where(Respondent.full_name.startswith(MARKER)))
+		await session.commit()
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--submissions", type=int, default=500)
+	parser.add_argument("--concurrency", type=int, default=50)
+	args = parser.parse_args()
+
+	try:
+		for name, save in (("sync SessionLocal (before)", save_sync), ("AsyncSessionLocal (after)", save_async)):
+			try:
+				latencies, lags, elapsed = await run(save, args.submissions, args.concurrency)
+			finally:
+				# Both runs use the same phones, which are unique per respondent and submission
+				await cleanup()
+			report(name, latencies, lags, elapsed)
+	finally:
+		await async_engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,336 @@
+"""Micro-benchmarks for the bot's hot paths, compared against stored baselines.
+
+Covers the survey and admin handlers of main.py (called directly with a stubbed Bot
+session and an in-memory FSMContext; admin views are served from warm caches), the
+keyboard builders, the answer validators (one by one and in a batch of 10,000) and
+the respondent detail rendering with 1, 100 and 10,000 records. Each case reports the
+median per-call time over several rounds, and the median of ``--repeat`` interleaved
+full runs. The whole machine speeds up and slows down by a third between runs, so each
+run's measurements are also expressed relative to a fixed pure-Python loop timed
+between its cases, and that relative cost is what is compared. The run fails when a case is slower
+than its baseline by more than ``--threshold`` percent and by more than
+``--noise-floor`` microseconds. No database or network is used.
+
+	python tools/bench_handlers.py                 # compare with tools/bench_baseline.json
+	python tools/bench_handlers.py --save          # record new baselines
+	python tools/bench_handlers.py -k render -k validate
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["FSM_STORAGE"] = "memory"
+
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Message
+
+import main
+import keyboard
+import survey
+import validators
+from callbacks import RespondentsPage, RespondentPick
+from database import Employee, Student, InstitutionType, Language
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+USER_ID = 770000001
+ROUND_SECONDS = 0.05
+CALIBRATION_ROUNDS = 3
+
+
+class StubSession(BaseSession):
+	"""Answers every Bot API call instantly with a canned message."""
+
+	def __init__(self, message):
+		super().__init__()
+		self._message = message
+
+	async def make_request(self, bot, method, timeout=None):
+		returning = method.__returning__
+		if returning is bool:
+			return True
+		if getattr(returning, "__origin__", None) is list:
+			return [self._message]
+		return self._message
+
+	async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+		yield b""
+
+	async def close(self):
+		pass
+
+
+def message(user_id=USER_ID, **content):
+	return Message.model_validate({
+		"message_id": 1,
+		"date": 0,
+		"chat": {"id": user_id, "type": "private"},
+		"from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+		**content,
+	}, context={"bot": main.bot})
+
+
+def callback(data, user_id=main.ADMIN_ID):
+	return CallbackQuery.model_validate({
+		"id": "1",
+		"from": {"id": user_id, "is_bot": False, "first_name": "Admin"},
+		"chat_instance": "bench",
+		"data": data,
+		"message": {"message_id": 1, "date": 0, "chat": {"id": user_id, "type": "private"}, "text": "bench"},
+	}, context={"bot": main.bot})
+
+
+def make_records(count):
+	employees = [
+		Employee(
+			full_name=f"Xodim {i}", date_of_birth=date(1990, 1, 1), address="Toshkent", email="x@example.com",
+			position="O‘qituvchi", start_date=date(2020, 9, 1), language=Language.UZBEK, user_phone="+998901234567",
+			institution_type=InstitutionType.BOGCHA_MAKTAB, selfie_file_id=f"file-{i}", selfie_unique_id=f"u-{i}",
+		)
+		for i in range(count - count // 2)
+	]
+	students = [
+		Student(
+			full_name=f"Bola {i}", date_of_birth=date(2018, 1, 1), age=7, address="Toshkent", diagnosis="bench",
+			attendance_days="Du, Chor", parent_name="Ota-ona", parent_email="p@example.com",
+			parent_phone="+998900000000", language=Language.UZBEK, user_phone="+998901234567",
+			institution_type=InstitutionType.MARKAZ, selfie_file_id=None, selfie_unique_id=None,
+		)
+		for i in range(count // 2)
+	]
+	return employees, students
+
+
+def build_cases():
+	"""Return ``(name, call, setup)`` triples; ``setup`` (optional) runs untimed before every call."""
+	storage = MemoryStorage()
+	state = FSMContext(storage, StorageKey(bot_id=main.bot.id, chat_id=USER_ID, user_id=USER_ID))
+	main.submission_queue.put = lambda model, row: None
+	main.selfie_ingestor.submit = lambda file_id, file_unique_id: None
+
+	employee = survey.EMPLOYEE_SURVEY
+	steps = survey.STEPS
+	full_name = steps[employee.steps[0].state.state]
+	email = steps[employee.steps[3].state.state]
+	start_date = steps[employee.steps[-1].state.state]
+	complete_data = {
+		"lang_text": "uz", "user_phone": "998901234567", "institution_type": "bogcha_maktab",
+		"selfie_file_id": "f", "selfie_unique_id": "u", "full_name": "Bench", "date_of_birth": "1990-01-01",
+		"address": "Toshkent", "email": "x@example.com", "position": "O‘qituvchi",
+	}
+
+	async def fill_state():
+		await state.set_data(complete_data)
+
+	start = message(text="/start")
+	language = message(text="🇺🇿 O‘zbekcha")
+	contact = message(contact={"phone_number": "998901234567", "first_name": "Bench", "user_id": USER_ID})
+	photo = message(photo=[{"file_id": "f", "file_unique_id": "u", "width": 640, "height": 640}])
+	institution = message(text="Bog‘cha, Maktab / Детский сад, Школа")
+	survey_type = message(text=employee.choice)
+	name_answer = message(text="Bench User")
+	bad_email = message(text="not-an-email")
+	date_answer = message(text="2020-09-01")
+	responses = message(user_id=main.ADMIN_ID, text="Javoblar / Ответы")
+
+	# Warm admin caches so the views are measured without the database
+	page_rows, _ = make_page(main.RESPONDENTS_PAGE_SIZE)
+	main.directory_cache.set((0, False), (page_rows, True))
+	main.directory_cache.set((page_rows[-1].id, False), (page_rows, True))
+	employees, students = make_records(1)
+	main.detail_cache.set(1, ("+998901234567",) + main.render_respondent_detail("+998901234567", employees, students))
+	next_page = callback(RespondentsPage(cursor=page_rows[-1].id).pack())
+	pick = callback(RespondentPick(id=1).pack())
+
+	cases = [
+		("handler.start_command", lambda: main.start_command(start, state, is_admin=False), None),
+		("handler.process_language", lambda: main.process_language(language, state, is_admin=False), None),
+		("handler.process_user_phone", lambda: main.process_user_phone(contact, state, is_admin=False, lang="uz"),
+		 None),
+		("handler.process_selfie", lambda: main.process_selfie(photo, state, is_admin=False, lang="uz"), None),
+		("handler.process_institution_type",
+		 lambda: main.process_institution_type(institution, state, is_admin=False, lang="uz"), None),
+		("handler.process_survey_type",
+		 lambda: main.process_survey_type(survey_type, state, is_admin=False, lang="uz"), None),
+		("handler.survey_step.valid", lambda: main.process_survey_step(
+			name_answer, state, is_admin=False, lang="uz", survey_step=full_name), None),
+		("handler.survey_step.invalid", lambda: main.process_survey_step(
+			bad_email, state, is_admin=False, lang="uz", survey_step=email), None),
+		("handler.survey_step.submit", lambda: main.process_survey_step(
+			date_answer, state, is_admin=False, lang="uz", survey_step=start_date), fill_state),
+		("handler.handle_responses_button", lambda: main.handle_responses_button(responses, state, is_admin=True),
+		 None),
+		("handler.handle_respondents_page", lambda: main.handle_respondents_page(
+			next_page, RespondentsPage.unpack(next_page.data), is_admin=True), None),
+		("handler.handle_respondent_pick", lambda: main.handle_respondent_pick(
+			pick, RespondentPick.unpack(pick.data), is_admin=True), None),
+		("keyboard.language", keyboard.get_language_keyboard, None),
+		("keyboard.survey_type", keyboard.get_survey_type_keyboard, None),
+		("keyboard.institution_type", keyboard.get_institution_type_keyboard, None),
+		("keyboard.contact", lambda: keyboard.get_contact_keyboard("uz"), None),
+		("keyboard.respondents_page", lambda: keyboard.get_respondents_keyboard(
+			page_rows, prev_page=RespondentsPage(cursor=1, back=True), next_page=RespondentsPage(cursor=20)), None),
+		("keyboard.respondent_back", keyboard.get_respondent_back_keyboard, None),
+	]
+
+	for name, validate, valid, invalid in (
+		("required_text", validators.required_text, "Toshkent", "   "),
+		("iso_date", validators.iso_date, "1990-01-01", "1990-13-01"),
+		("positive_int", validators.positive_int, "7", "-3"),
+		("email", validators.email, "user.name@example.com", "not-an-email"),
+		("phone", validators.normalize_phone, "+998901234567", "12-34"),
+	):
+		cases.append((f"validate.{name}.valid", lambda validate=validate, valid=valid: validate(valid), None))
+		cases.append((f"validate.{name}.invalid", lambda validate=validate, invalid=invalid: rejects(validate, invalid),
+					  None))
+
+	phones = [f"+998 90 {i:03d}-{i % 100:02d}-{i % 97:02d}" if i % 3 else "12-34" for i in range(10000)]
+	cases.append(("validate.batch.phone.10000", lambda: validators.validate_batch(validators.normalize_phone, phones), None))
+
+	for count in (1, 100, 10000):
+		employees, students = make_records(count)
+		cases.append((
+			f"render.detail.{count}",
+			lambda employees=employees, students=students: main.render_respondent_detail(
+				"+998901234567", employees, students
+			),
+			None,
+		))
+		text, _ = main.render_respondent_detail("+998901234567", employees, students)
+		cases.append((f"render.split.{count}", lambda text=text: main.split_message(text), None))
+	return cases
+
+
+def make_page(size):
+	class Row:
+		def __init__(self, id, phone, full_name):
+			self.id, self.phone, self.full_name = id, phone, full_name
+
+	return [Row(i, f"+99890{i:07d}", f"Respondent {i}") for i in range(1, size + 1)], True
+
+
+def rejects(validate, value):
+	try:
+		validate(value)
+	except ValueError:
+		return True
+	raise AssertionError(f"{value!r} was accepted")
+
+
+def calibration():
+	"""Fixed interpreter work that follows the machine's speed like the cases do."""
+	total = 0
+	for i in range(200):
+		total += len(f"{i}:{i * 2}") + len({"key": str(i)}["key"])
+	return total
+
+
+async def measure(call, setup, rounds):
+	"""Median per-call time in seconds over ``rounds`` rounds of about ROUND_SECONDS each."""
+	if setup is not None:
+		await setup()
+	is_async = asyncio.iscoroutine(probe := call())
+	if is_async:
+		await probe
+	per_call = []
+	for _ in range(rounds):
+		calls = 0
+		elapsed = 0.0
+		while elapsed < ROUND_SECONDS:
+			if setup is not None:
+				await setup()
+			started = time.perf_counter()
+			if is_async:
+				await call()
+			else:
+				call()
+			elapsed += time.perf_counter() - started
+			calls += 1
+		per_call.append(elapsed / calls)
+	return statistics.median(per_call)
+
+
+def format_time(seconds):
+	if seconds >= 1e-3:
+		return f"{seconds * 1e3:9.3f} ms"
+	return f"{seconds * 1e6:9.2f} µs"
+
+
+async def run(args):
+	baseline = {}
+	if os.path.exists(args.baseline):
+		with open(args.baseline, encoding="utf-8") as stored:
+			baseline = json.load(stored)
+
+	cases = [case for case in build_cases() if not args.k or any(pattern in case[0] for pattern in args.k)]
+	samples = {name: [] for name, _, _ in cases}
+	relative = {name: [] for name, _, _ in cases}
+	# Interleaved, so a slow stretch of the machine affects every case a little rather than some a lot
+	for _ in range(args.repeat):
+		# Timed between the cases, so the median follows the machine's speed during this run
+		references = []
+		for name, call, setup in cases:
+			references.append(await measure(calibration, None, CALIBRATION_ROUNDS))
+			samples[name].append(await measure(call, setup, args.rounds))
+		reference = statistics.median(references)
+		for name, _, _ in cases:
+			relative[name].append(samples[name][-1] / reference)
+
+	results = {}
+	regressions = []
+	noise_floor = args.noise_floor / 1e6
+	for name, _, _ in cases:
+		seconds = statistics.median(samples[name])
+		results[name] = {"seconds": seconds, "relative": statistics.median(relative[name])}
+		line = f"{name:<40}{format_time(seconds)}"
+		if name in baseline and not args.save:
+			expected = baseline[name]
+			change = (results[name]["relative"] - expected["relative"]) / expected["relative"] * 100
+			line += f"  {change:+7.1f}% vs {format_time(expected['seconds']).strip()}"
+			if change > args.threshold and seconds - expected["seconds"] > noise_floor:
+				regressions.append(name)
+				line += "  REGRESSION"
+		print(line)
+
+	if args.save:
+		baseline.update(results)
+		with open(args.baseline, "w", encoding="utf-8") as stored:
+			json.dump({name: baseline[name] for name in sorted(baseline)}, stored, indent=2)
+			stored.write("\n")
+		print(f"saved {len(results)} baselines to {args.baseline}")
+		return 0
+	if regressions:
+		print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold}%: {', '.join(regressions)}")
+		return 1
+	return 0
+
+
+def cli():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--baseline", default=BASELINE_PATH)
+	parser.add_argument("--save", action="store_true", help="record the results as the new baselines")
+	parser.add_argument("--threshold", type=float, default=25.0, help="allowed slowdown in percent")
+	parser.add_argument(
+		"--noise-floor", type=float, default=1.0, help="slowdowns below this many microseconds are never regressions",
+	)
+	parser.add_argument("--rounds", type=int, default=15)
+	parser.add_argument("--repeat", type=int, default=5, help="full runs whose median is compared or saved")
+	parser.add_argument("-k", action="append", default=[], help="only run cases containing this substring")
+	args = parser.parse_args()
+
+	logging.disable(logging.CRITICAL)
+	main.bot.session = StubSession(message(text="ok"))
+	sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+	cli()
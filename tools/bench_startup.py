@@ -0,0 +1,84 @@
+"""Cold-start benchmark: process start to first handled update.
+
+Serves the fake Bot API of tools/load_test.py, queues a /start update before the bot
+is even launched, then starts the bot and records when it first polls for updates and
+when the reply to /start arrives. Each run starts a fresh interpreter, so the numbers
+include imports, the database readiness check and migrations. Use ``--entrypoint`` to
+go through entrypoint.sh as the container does.
+
+	python tools/bench_startup.py --runs 5
+	python tools/bench_startup.py --entrypoint
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+from load_test import FakeBotApi, start_bot, FIRST_CHAT_ID
+
+START = {
+	"message_id": 1,
+	"chat": {"id": FIRST_CHAT_ID, "type": "private"},
+	"from": {"id": FIRST_CHAT_ID, "is_bot": False, "first_name": "Startup"},
+	"text": "/start",
+	"entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+}
+
+
+async def run_once(port, entrypoint, timeout, env_overrides):
+	"""Return ``(seconds to first getUpdates, seconds to the /start reply)`` for one cold start."""
+	api = FakeBotApi()
+	runner = web.AppRunner(api.app())
+	await runner.setup()
+	await web.TCPSite(runner, "127.0.0.1", port).start()
+	await api.push({**START, "date": int(time.time())})
+	workdir = tempfile.mkdtemp(prefix="bench_startup_")
+	started = time.perf_counter()
+	bot = await start_bot(f"http://127.0.0.1:{port}", env_overrides, workdir, entrypoint=entrypoint)
+	try:
+		await asyncio.wait_for(api.ready.wait(), timeout)
+		polling = time.perf_counter() - started
+		await asyncio.wait_for(api.replies(FIRST_CHAT_ID).get(), timeout)
+		replied = time.perf_counter() - started
+	except asyncio.TimeoutError:
+		raise RuntimeError(f"bot did not answer within {timeout}s, see {workdir}/bot.log") from None
+	finally:
+		if bot.returncode is None:
+			bot.send_signal(signal.SIGTERM)
+			await bot.wait()
+		await runner.cleanup()
+	return polling, replied
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--runs", type=int, default=3)
+	parser.add_argument("--timeout", type=float, default=60.0)
+	parser.add_argument("--port", type=int, default=8082, help="port of the fake Bot API")
+	parser.add_argument("--entrypoint", action="store_true", help="start through entrypoint.sh")
+	parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra bot environment")
+	args = parser.parse_args()
+
+	env_overrides = dict(item.split("=", 1) for item in args.env)
+	polling, replied = [], []
+	for run in range(1, args.runs + 1):
+		first_poll, first_reply = await run_once(args.port, args.entrypoint, args.timeout, env_overrides)
+		polling.append(first_poll)
+		replied.append(first_reply)
+		print(f"run {run}: first getUpdates {first_poll * 1e3:8.1f} ms, /start answered {first_reply * 1e3:8.1f} ms")
+	print(
+		f"median of {args.runs}: first getUpdates {statistics.median(polling) * 1e3:8.1f} ms, "
+		f"/start answered {statistics.median(replied) * 1e3:8.1f} ms"
+	)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,351 @@
+"""End-to-end load test: synthetic respondents against the bot and a stand-in Bot API.
+
+Serves a local fake Bot API (getUpdates, sendMessage, sendPhoto, sendMediaGroup,
+editMessageText, getFile and file downloads), starts main.py in polling mode against
+it and the configured database, and lets synthetic users walk the whole language →
+contact → selfie → institution → employee/student survey. Reports throughput,
+per-step latency (update queued → bot reply received) and errors, then checks that
+the submissions reached the database. Rows are tagged and removed afterwards, and the
+statistics rollup they were counted in is rebuilt without them.
+
+Nothing leaves the machine; point DB_* at a local Postgres migrated with alembic.
+
+	python tools/load_test.py --users 200 --concurrency 50
+	python tools/load_test.py --users 500 --concurrency 200 --env OUTBOUND_GLOBAL_RATE=1000
+	python tools/load_test.py --users 500 --concurrency 200 --env BOT_WORKERS=4   # receiver + 4 workers
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from PIL import Image
+from sqlalchemy import delete, func, select
+
+from database import AsyncSessionLocal, async_engine, Employee, Student, Respondent, Selfie
+from stats import rebuild_stats
+from survey import SURVEYS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:load-test"
+MARKER = "__load_test__"
+PHONE_PREFIX = "99877"
+FIRST_CHAT_ID = 770000000
+LANGUAGE_CHOICE = "🇺🇿 O‘zbekcha"
+INSTITUTION_CHOICE = "Bog‘cha, Maktab / Детский сад, Школа"
+DONE_REPLY = "OK, rahmat"
+SAMPLE_ANSWERS = {
+	"full_name": MARKER,
+	"date_of_birth": "1990-01-01",
+	"address": "Toshkent",
+	"email": "load@example.com",
+	"position": "O‘qituvchi",
+	"start_date": "2020-09-01",
+	"age": "7",
+	"diagnosis": "load test",
+	"attendance_days": "Du, Chor, Ju",
+	"parent_name": "Ota-ona",
+	"parent_email": "parent@example.com",
+	"parent_phone": "+998900000000",
+}
+
+
+def make_jpeg():
+	buffer = BytesIO()
+	Image.new("RGB", (640, 640), (200, 120, 80)).save(buffer, format="JPEG")
+	return buffer.getvalue()
+
+
+def percentile(values, pct):
+	if not values:
+		return 0.0
+	values = sorted(values)
+	index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+	return values[index]
+
+
+class FakeBotApi:
+	"""Just enough of the Bot API for the survey flows; replies are routed to per-chat queues."""
+
+	def __init__(self):
+		self.ready = asyncio.Event()
+		self.calls = defaultdict(int)
+		self._updates = []
+		self._update_ids = itertools.count(1)
+		self._message_ids = itertools.count(1)
+		self._arrived = asyncio.Condition()
+		self._replies = defaultdict(asyncio.Queue)
+		self._photo = make_jpeg()
+
+	def app(self):
+		app = web.Application(client_max_size=20 * 1024 * 1024)
+		app.router.add_post("/bot{token}/{method}", self.handle_method)
+		app.router.add_get("/file/bot{token}/{path:.*}", self.handle_file)
+		return app
+
+	async def push(self, message):
+		async with self._arrived:
+			self._updates.append({"update_id": next(self._update_ids), "message": message})
+			self._arrived.notify_all()
+
+	def replies(self, chat_id):
+		return self._replies[chat_id]
+
+	async def handle_method(self, request):
+		method = request.match_info["method"]
+		params = dict(await request.post())
+		self.calls[method] += 1
+		handler = getattr(self, f"api_{method}", None)
+		result = await handler(params) if handler is not None else True
+		return web.json_response({"ok": True, "result": result})
+
+	async def handle_file(self, request):
+		return web.Response(body=self._photo, content_type="image/jpeg")
+
+	async def api_getMe(self, params):
+		return {"id": 1, "is_bot": True, "first_name": "Load test", "username": "load_test_bot"}
+
+	async def api_getUpdates(self, params):
+		self.ready.set()
+		offset = int(params.get("offset", 0))
+		timeout = float(params.get("timeout", 0))
+		limit = int(params.get("limit", 100))
+		async with self._arrived:
+			self._updates = [update for update in self._updates if update["update_id"] >= offset]
+			if not self._updates and timeout:
+				try:
+					await asyncio.wait_for(self._arrived.wait(), timeout)
+				except asyncio.TimeoutError:
+					pass
+			return self._updates[:limit]
+
+	def _message(self, params, **content):
+		chat_id = int(params["chat_id"])
+		return {
+			"message_id": next(self._message_ids),
+			"date": int(time.time()),
+			"chat": {"id": chat_id, "type": "private"},
+			"from": {"id": 1, "is_bot": True, "first_name": "Load test"},
+			**content,
+		}
+
+	def _reply(self, method, message):
+		self._replies[message["chat"]["id"]].put_nowait((method, message.get("text") or message.get("caption")))
+		return message
+
+	async def api_sendMessage(self, params):
+		return self._reply("sendMessage", self._message(params, text=params.get("text", "")))
+
+	async def api_editMessageText(self, params):
+		return self._reply("editMessageText", self._message(params, text=params.get("text", "")))
+
+	async def api_sendPhoto(self, params):
+		photo = [{"file_id": "sent", "file_unique_id": "sent", "width": 320, "height": 320}]
+		return self._reply("sendPhoto", self._message(params, photo=photo, caption=params.get("caption")))
+
+	async def api_sendMediaGroup(self, params):
+		media = json.loads(params.get("media", "[]"))
+		return [self._message(params, photo=[{"file_id": "sent", "file_unique_id": "sent", "width": 1, "height": 1}])
+				for _ in media]
+
+	async def api_getFile(self, params):
+		file_id = params["file_id"]
+		return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self._photo),
+				"file_path": f"photos/{file_id}.jpg"}
+
+
+class Results:
+	def __init__(self):
+		self.latencies = defaultdict(list)
+		self.errors = defaultdict(int)
+		self.completed = 0
+		self.failed = 0
+		self.updates = 0
+
+
+def user_script(index, survey):
+	"""The (step, message, expected reply) sequence of one respondent."""
+	chat_id = FIRST_CHAT_ID + index
+	sender = {"id": chat_id, "is_bot": False, "first_name": f"User {index}"}
+	base = {"chat": {"id": chat_id, "type": "private"}, "from": sender}
+	file_id = f"load-{index}"
+
+	def text(value, **extra):
+		return {**base, "text": value, **extra}
+
+	script = [
+		("start", text("/start", entities=[{"type": "bot_command", "offset": 0, "length": 6}]), None),
+		("language", text(LANGUAGE_CHOICE), None),
+		("contact", {**base, "contact": {
+			"phone_number": f"{PHONE_PREFIX}{index:07d}", "first_name": sender["first_name"], "user_id": chat_id,
+		}}, None),
+		("selfie", {**base, "photo": [{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640}]},
+		 None),
+		("institution", text(INSTITUTION_CHOICE), None),
+		("survey_type", text(survey.choice), survey.first.prompt["uz"]),
+	]
+	for i, step in enumerate(survey.steps):
+		answer = SAMPLE_ANSWERS[step.key]
+		if step.key == "full_name":
+			answer = f"{MARKER} {index}"
+		expected = survey.steps[i + 1].prompt["uz"] if i + 1 < len(survey.steps) else DONE_REPLY
+		script.append((f"{survey.name}.{step.key}", text(answer), expected))
+	return script
+
+
+async def run_user(api, index, survey, results, think, timeout):
+	replies = api.replies(FIRST_CHAT_ID + index)
+	for step, message, expected in user_script(index, survey):
+		message = {**message, "message_id": results.updates + 1, "date": int(time.time())}
+		started = time.perf_counter()
+		await api.push(message)
+		results.updates += 1
+		try:
+			_, reply = await asyncio.wait_for(replies.get(), timeout)
+		except asyncio.TimeoutError:
+			results.errors[f"{step} timeout"] += 1
+			results.failed += 1
+			return
+		results.latencies[step].append(time.perf_counter() - started)
+		if expected is not None and reply != expected:
+			results.errors[f"{step} unexpected reply"] += 1
+			results.failed += 1
+			return
+		await asyncio.sleep(think)
+	results.completed += 1
+
+
+async def start_bot(api_url, env_overrides, workdir, entrypoint=False):
+	env = {
+		**os.environ,
+		"BOT_TOKEN": TOKEN,
+		"TELEGRAM_API_URL": api_url,
+		"RUN_MODE": "polling",
+		"ADMIN_ID": "1",
+		"METRICS_PORT": "0",
+		"DIGEST_INTERVAL": "0",
+		"SELFIE_DIR": os.path.join(workdir, "selfies"),
+		"SUBMISSION_SPILL_PATH": os.path.join(workdir, "submissions.spill.jsonl"),
+		**env_overrides,
+	}
+	log = open(os.path.join(workdir, "bot.log"), "wb")
+	command = ("bash", "entrypoint.sh") if entrypoint else (sys.executable, "main.py")
+	process = await asyncio.create_subprocess_exec(
+		*command, cwd=ROOT, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT
+	)
+	log.close()
+	return process
+
+
+async def count_rows():
+	async with AsyncSessionLocal() as session:
+		employees = (await session.execute(
+			select(func.count()).select_from(Employee).where(Employee.full_name.startswith(MARKER))
+		)).scalar()
+		students = (await session.execute(
+			select(func.count()).select_from(Student).where(Student.full_name.startswith(MARKER))
+		)).scalar()
+	return employees + students
+
+
+async def cleanup():
+	async with AsyncSessionLocal() as session:
+		await session.execute(delete(Employee).where(Employee.full_name.startswith(MARKER)))
+		await session.execute(delete(Student).where(Student.full_name.startswith(MARKER)))
+		await session.execute(delete(Respondent).where(Respondent.phone.startswith(f"+{PHONE_PREFIX}")))
+		await session.execute(delete(Selfie).where(Selfie.file_unique_id.startswith("load-")))
+		# Every flush also counted its rows in submission_stats
+		await rebuild_stats(session)
+		await session.commit()
+
+
+def report(results, elapsed, rows):
+	total = results.completed + results.failed
+	print(f"users: {results.completed}/{total} completed in {elapsed:.1f}s")
+	print(f"throughput: {results.completed / elapsed:.2f} surveys/s, {results.updates / elapsed:.1f} updates/s")
+	print(f"{'step':<32}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+	order = list(dict.fromkeys(step for survey in SURVEYS for step, _, _ in user_script(0, survey)))
+	for step in order:
+		latencies = results.latencies.get(step)
+		if not latencies:
+			continue
+		print(
+			f"{step:<32}{len(latencies):>7}{percentile(latencies, 50) * 1000:>10.1f}"
+			f"{percentile(latencies, 95) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}"
+		)
+	print(f"errors: {dict(results.errors) or 'none'}")
+	if rows is not None:
+		print(f"rows in database: {rows} (expected {results.completed})")
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--users", type=int, default=100)
+	parser.add_argument("--concurrency", type=int, default=50, help="users in a survey at the same time")
+	parser.add_argument("--think", type=float, default=1.2,
+						help="seconds between a reply and the next answer (keep above 1/THROTTLE_MESSAGE_RATE)")
+	parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for each reply")
+	parser.add_argument("--port", type=int, default=8081, help="port of the fake Bot API")
+	parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra bot environment")
+	parser.add_argument("--keep", action="store_true", help="keep the generated rows")
+	args = parser.parse_args()
+
+	api = FakeBotApi()
+	runner = web.AppRunner(api.app())
+	await runner.setup()
+	await web.TCPSite(runner, "127.0.0.1", args.port).start()
+	workdir = tempfile.mkdtemp(prefix="load_test_")
+	env_overrides = dict(item.split("=", 1) for item in args.env)
+	bot = await start_bot(f"http://127.0.0.1:{args.port}", env_overrides, workdir)
+	rows = None
+	try:
+		ready = asyncio.create_task(api.ready.wait())
+		exited = asyncio.create_task(bot.wait())
+		await asyncio.wait({ready, exited}, timeout=60, return_when=asyncio.FIRST_COMPLETED)
+		exited.cancel()
+		if not api.ready.is_set():
+			ready.cancel()
+			print(f"bot did not start polling, see {workdir}/bot.log")
+			return
+
+		results = Results()
+		semaphore = asyncio.Semaphore(args.concurrency)
+
+		async def user(index):
+			async with semaphore:
+				await run_user(api, index, SURVEYS[index % len(SURVEYS)], results, args.think, args.timeout)
+
+		started = time.perf_counter()
+		await asyncio.gather(*(user(index) for index in range(args.users)))
+		elapsed = time.perf_counter() - started
+	finally:
+		if bot.returncode is None:
+			bot.send_signal(signal.SIGTERM)
+			await bot.wait()
+		await runner.cleanup()
+
+	try:
+		try:
+			rows = await count_rows()
+		except Exception as e:
+			print(f"could not count rows: {str(e)}")
+		report(results, elapsed, rows)
+		print(f"bot api calls: {dict(api.calls)}; bot log: {workdir}/bot.log")
+		if not args.keep:
+			await cleanup()
+	finally:
+		await async_engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
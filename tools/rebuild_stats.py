@@ -0,0 +1,34 @@
+"""Recompute the submission_stats rollup from the employees and students tables.
+
+Run after restoring data, bulk edits or deletes made outside the bot; archived days keep
+their counts. Flushes from a running bot wait for the rebuild to commit, so it is safe
+while the bot is up.
+
+	python tools/rebuild_stats.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import AsyncSessionLocal, async_engine
+from stats import rebuild_stats
+
+
+async def main():
+	argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+	started = time.perf_counter()
+	try:
+		async with AsyncSessionLocal() as session:
+			rows = await rebuild_stats(session)
+			await session.commit()
+	finally:
+		await async_engine.dispose()
+	print(f"rebuilt {rows} rollup rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
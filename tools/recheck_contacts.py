@@ -0,0 +1,78 @@
+"""Re-check stored contact fields against the current validators.
+
+Streams employees and students in batches and runs each contact column through
+validators.validate_batch, reporting values that are now rejected and values that
+are valid but not stored in canonical form. Nothing is modified.
+
+	python tools/recheck_contacts.py
+	python tools/recheck_contacts.py --batch-size 5000 --show 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, async_engine, Employee, Student
+from validators import email, normalize_phone, validate_batch
+
+CHECKS = {
+	Employee: (("user_phone", normalize_phone), ("email", email)),
+	Student: (("user_phone", normalize_phone), ("parent_phone", normalize_phone), ("parent_email", email)),
+}
+
+
+async def recheck(model, batch_size, show):
+	checks = CHECKS[model]
+	columns = [getattr(model, name) for name, _ in checks]
+	counts = {name: [0, 0] for name, _ in checks}
+	examples = []
+	rows = 0
+	async with AsyncSessionLocal() as session:
+		result = await session.stream(select(model.id, *columns).execution_options(yield_per=batch_size))
+		async for partition in result.partitions():
+			rows += len(partition)
+			ids = [row[0] for row in partition]
+			for position, (name, validate) in enumerate(checks, start=1):
+				values = [row[position] for row in partition]
+				cleaned, errors = validate_batch(validate, values)
+				for index, (value, canonical) in enumerate(zip(values, cleaned)):
+					if index in errors:
+						counts[name][0] += 1
+						problem = f"rejected ({errors[index]})"
+					elif canonical != value:
+						counts[name][1] += 1
+						problem = f"not canonical, expected {canonical!r}"
+					else:
+						continue
+					if len(examples) < show:
+						examples.append(f"  {model.__tablename__}.{name} id={ids[index]} {value!r}: {problem}")
+	return rows, counts, examples
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--batch-size", type=int, default=2000)
+	parser.add_argument("--show", type=int, default=10, help="examples to print per table")
+	args = parser.parse_args()
+
+	try:
+		for model in CHECKS:
+			started = time.perf_counter()
+			rows, counts, examples = await recheck(model, args.batch_size, args.show)
+			summary = ", ".join(
+				f"{name}: {rejected} rejected, {stale} not canonical" for name, (rejected, stale) in counts.items()
+			)
+			print(f"{model.__tablename__}: {rows} rows in {time.perf_counter() - started:.2f}s; {summary}")
+			for line in examples:
+				print(line)
+	finally:
+		await async_engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
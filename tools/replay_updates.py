@@ -0,0 +1,58 @@
+"""Post recorded Telegram updates to a locally running webhook server.
+
+Each file holds one update object or a JSON list of them; update_id is rewritten so
+the same recording can be replayed repeatedly.
+
+	RUN_MODE=webhook WEBHOOK_SECRET=s3cret python main.py
+	python tools/replay_updates.py tools/updates/*.json --secret s3cret --repeat 100 --concurrency 20
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+from aiohttp import ClientSession
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def load_updates(paths):
+	updates = []
+	for path in paths:
+		with open(path, encoding="utf-8") as recording:
+			data = json.load(recording)
+		updates.extend(data if isinstance(data, list) else [data])
+	return updates
+
+
+async def main():
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("files", nargs="+")
+	parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+	parser.add_argument("--secret", default="")
+	parser.add_argument("--repeat", type=int, default=1)
+	parser.add_argument("--concurrency", type=int, default=1)
+	args = parser.parse_args()
+
+	updates = load_updates(args.files)
+	update_ids = itertools.count(int(time.time()))
+	headers = {SECRET_HEADER: args.secret} if args.secret else {}
+	semaphore = asyncio.Semaphore(args.concurrency)
+	statuses = {}
+
+	async def post(session, update):
+		async with semaphore:
+			async with session.post(args.url, json={**update, "update_id": next(update_ids)}, headers=headers) as response:
+				statuses[response.status] = statuses.get(response.status, 0) + 1
+
+	started = time.perf_counter()
+	async with ClientSession() as session:
+		await asyncio.gather(*(post(session, update) for _ in range(args.repeat) for update in updates))
+	elapsed = time.perf_counter() - started
+	total = sum(statuses.values())
+	print(f"posted {total} updates in {elapsed:.2f}s ({total / elapsed:.1f}/s), statuses: {statuses}")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
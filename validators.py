@@ -0,0 +1,78 @@
+import re
+from datetime import date
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# Separators people type inside phone numbers
+PHONE_SEPARATORS = re.compile(r'[\s().-]')
+# E.164: a country code that does not start with 0, 10-15 digits in total as before
+E164_DIGITS = re.compile(r'^[1-9]\d{9,14}$')
+
+
+def required_text(text):
+	if not text.strip():
+		raise ValueError("empty")
+	return text
+
+
+def parse_date(value):
+	"""``yil-oy-kun`` / ``YYYY-MM-DD`` only; other ISO 8601 forms are rejected."""
+	if not DATE_PATTERN.match(value):
+		raise ValueError("expected YYYY-MM-DD")
+	return date.fromisoformat(value)
+
+
+def iso_date(text):
+	parse_date(text)
+	return text
+
+
+def positive_int(text):
+	value = int(text)
+	if value <= 0:
+		raise ValueError("not positive")
+	return value
+
+
+def email(text):
+	"""Stored with the domain lowercased; the local part is kept as typed."""
+	text = text.strip()
+	if not EMAIL_PATTERN.match(text):
+		raise ValueError("invalid email")
+	local, _, domain = text.rpartition("@")
+	return f"{local}@{domain.lower()}"
+
+
+def normalize_phone(text):
+	"""Canonical E.164 form (``+998901234567``) of a typed or shared phone number.
+
+	Spaces, dashes, dots and brackets are dropped and a ``00`` international prefix
+	becomes ``+``, so ``+998 90 123-45-67``, ``998901234567`` and ``00998901234567``
+	are the same number.
+	"""
+	digits = PHONE_SEPARATORS.sub("", text)
+	if digits.startswith("+"):
+		digits = digits[1:]
+	elif digits.startswith("00"):
+		digits = digits[2:]
+	if not E164_DIGITS.match(digits):
+		raise ValueError("invalid phone")
+	return "+" + digits
+
+
+def validate_batch(validate, values):
+	"""Run one validator over many values, e.g. for imports and re-checks of stored data.
+
+	Returns ``(cleaned, errors)``: ``cleaned`` has one entry per value (``None`` where it
+	was rejected) and ``errors`` maps the index of every rejected value to the reason.
+	"""
+	cleaned = []
+	errors = {}
+	append = cleaned.append
+	for index, value in enumerate(values):
+		try:
+			append(validate(value))
+		except (ValueError, TypeError) as e:
+			append(None)
+			errors[index] = str(e)
+	return cleaned, errors
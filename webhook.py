@@ -0,0 +1,110 @@
+import asyncio
+import hmac
+import logging
+import signal
+from contextlib import suppress
+
+from aiogram.types import Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler:
+	"""Accepts Telegram updates over HTTP and feeds them to the dispatcher.
+
+	At most ``max_in_flight`` updates are processed at once; when the limit is reached
+	the request is held until a slot frees up, which makes Telegram slow down delivery.
+	"""
+
+	def __init__(self, dp, bot, secret_token=None, max_in_flight=100):
+		self._dp = dp
+		self._bot = bot
+		self._secret_token = secret_token
+		self._slots = asyncio.Semaphore(max_in_flight)
+		self._tasks = set()
+
+	@property
+	def in_flight(self):
+		return len(self._tasks)
+
+	async def handle_update(self, request):
+		if self._secret_token and not hmac.compare_digest(
+			request.headers.get(SECRET_HEADER, ""), self._secret_token
+		):
+			logger.warning(f"Rejected webhook request from {request.remote}: bad secret token")
+			return web.Response(status=401)
+
+		try:
+			update = Update.model_validate(await request.json(), context={"bot": self._bot})
+		except ValueError as e:
+			logger.warning(f"Rejected malformed webhook update: {str(e)}")
+			return web.Response(status=400)
+
+		await self._slots.acquire()
+		task = asyncio.create_task(self._process(update))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+		return web.Response()
+
+	async def _process(self, update):
+		try:
+			await self._dp.feed_update(self._bot, update)
+		except Exception as e:
+			logger.error(f"Failed to process update {update.update_id}: {str(e)}")
+		finally:
+			self._slots.release()
+
+	async def handle_health(self, request):
+		return web.json_response({"status": "ok", "in_flight": self.in_flight})
+
+	async def drain(self):
+		if self._tasks:
+			await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def build_webhook_app(dp, bot, path="/webhook", secret_token=None, max_in_flight=100):
+	handler = WebhookHandler(dp, bot, secret_token=secret_token, max_in_flight=max_in_flight)
+	app = web.Application()
+	app["webhook_handler"] = handler
+	app.router.add_post(path, handler.handle_update)
+	app.router.add_get("/healthz", handler.handle_health)
+	return app
+
+
+async def run_webhook(dp, bot, host, port, path, base_url=None, secret_token=None, max_in_flight=100, allowed_updates=None):
+	"""Serve the webhook until SIGTERM/SIGINT, registering it with Telegram when ``base_url`` is set.
+
+	``allowed_updates`` defaults to the update types ``dp`` has handlers for.
+	"""
+	app = build_webhook_app(dp, bot, path=path, secret_token=secret_token, max_in_flight=max_in_flight)
+	stop = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for sig in (signal.SIGTERM, signal.SIGINT):
+		with suppress(NotImplementedError):
+			loop.add_signal_handler(sig, stop.set)
+
+	runner = web.AppRunner(app)
+	await runner.setup()
+	await dp.emit_startup(bot=bot, dispatcher=dp)
+	try:
+		await web.TCPSite(runner, host, port).start()
+		if base_url:
+			await bot.set_webhook(
+				url=base_url.rstrip("/") + path,
+				secret_token=secret_token,
+				allowed_updates=allowed_updates if allowed_updates is not None else dp.resolve_used_update_types(),
+				max_connections=min(max_in_flight, 100),
+			)
+		logger.info(f"Webhook server listening on {host}:{port}{path}")
+		await stop.wait()
+	finally:
+		logger.info("Webhook server stopping")
+		await runner.cleanup()
+		await app["webhook_handler"].drain()
+		try:
+			await dp.emit_shutdown(bot=bot, dispatcher=dp)
+		finally:
+			await bot.session.close()
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from contextlib import suppress
+
+from aiogram import Dispatcher
+from aiogram.types import Update
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Updates travel as one JSON document per line; photos and long texts stay far below this
+LINE_LIMIT = 16 * 1024 * 1024
+HEARTBEAT = b"alive"
+
+WORKER_UP = Gauge("bot_worker_up", "Whether the worker process is running and sending heartbeats", ["worker"])
+WORKER_RESTARTS = Counter("bot_worker_restarts_total", "Worker processes restarted after a crash or hang", ["worker"])
+UPDATES_FORWARDED = Counter("bot_updates_forwarded_total", "Updates handed to a worker", ["worker"])
+
+
+def worker_env(index, count, base_env):
+	"""Environment of worker ``index``: per-process files and ports, and its share of global limits."""
+	env = dict(base_env, BOT_WORKER_INDEX=str(index), DB_MIGRATE_ON_START="0")
+	if index:
+		root, ext = os.path.splitext(base_env.get("SUBMISSION_SPILL_PATH", "data/submissions.spill.jsonl"))
+		env["SUBMISSION_SPILL_PATH"] = f"{root}.{index}{ext}"
+		# The admin digest needs a single listener
+		env["DIGEST_INTERVAL"] = "0"
+	metrics_port = int(base_env.get("METRICS_PORT", 9000))
+	env["METRICS_PORT"] = str(metrics_port + 1 + index) if metrics_port else "0"
+	env["OUTBOUND_GLOBAL_RATE"] = str(float(base_env.get("OUTBOUND_GLOBAL_RATE", 30)) / count)
+	return env
+
+
+class WorkerProcess:
+	"""One supervised worker: restarted with backoff when it exits or stops sending heartbeats.
+
+	Updates wait in a bounded queue while the worker is down, so a restart loses at most
+	the updates it was already processing.
+	"""
+
+	def __init__(
+		self, index, command, env, queue_size=1000, heartbeat_timeout=15.0, startup_timeout=120.0,
+		max_restart_delay=30.0,
+	):
+		self.index = index
+		self.queue = asyncio.Queue(queue_size)
+		self.ready = asyncio.Event()
+		self.restarts = 0
+		self._command = command
+		self._env = env
+		self._heartbeat_timeout = heartbeat_timeout
+		self._startup_timeout = startup_timeout
+		self._max_restart_delay = max_restart_delay
+		self._process = None
+		self._pending = None
+		self._last_seen = 0.0
+		self._stopping = False
+		self._task = None
+
+	def start(self):
+		self._task = asyncio.create_task(self._supervise())
+
+	async def stop(self, timeout=30.0):
+		"""Deliver the queued updates, close the worker's input and wait for it to drain and exit."""
+		self._stopping = True
+		await self.queue.put(None)
+		try:
+			# Cancels the supervisor on timeout, so the worker is not restarted
+			await asyncio.wait_for(self._task, timeout)
+		except asyncio.TimeoutError:
+			logger.warning(f"Worker {self.index} did not exit within {timeout}s, killing it")
+			if self._process is not None and self._process.returncode is None:
+				self._process.kill()
+				await self._process.wait()
+
+	async def _supervise(self):
+		delay = 1.0
+		while True:
+			started = time.monotonic()
+			self._process = await asyncio.create_subprocess_exec(
+				*self._command, env=self._env, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+				# Terminal signals go to the receiver only; workers stop when their input closes
+				start_new_session=True,
+			)
+			self._last_seen = time.monotonic()
+			logger.info(f"Worker {self.index} started (pid {self._process.pid})")
+			tasks = [
+				asyncio.create_task(self._feed()),
+				asyncio.create_task(self._read_heartbeats()),
+				asyncio.create_task(self._watchdog()),
+			]
+			try:
+				returncode = await self._process.wait()
+			finally:
+				for task in tasks:
+					task.cancel()
+				await asyncio.gather(*tasks, return_exceptions=True)
+				self.ready.clear()
+				WORKER_UP.labels(self.index).set(0)
+			if self._stopping and self._pending is None:
+				logger.info(f"Worker {self.index} exited with code {returncode}")
+				return
+
+			if time.monotonic() - started > 60:
+				delay = 1.0
+			logger.error(f"Worker {self.index} exited with code {returncode}, restarting in {delay:.0f}s")
+			self.restarts += 1
+			WORKER_RESTARTS.labels(self.index).inc()
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, self._max_restart_delay)
+
+	async def _feed(self):
+		stdin = self._process.stdin
+		while True:
+			if self._pending is None:
+				self._pending = await self.queue.get()
+			if self._pending is None:
+				stdin.close()
+				return
+			stdin.write(self._pending)
+			await stdin.drain()
+			self._pending = None
+
+	async def _read_heartbeats(self):
+		async for line in self._process.stdout:
+			if line.strip() == HEARTBEAT:
+				self._last_seen = time.monotonic()
+				if not self.ready.is_set():
+					self.ready.set()
+					WORKER_UP.labels(self.index).set(1)
+
+	async def _watchdog(self):
+		while True:
+			await asyncio.sleep(self._heartbeat_timeout / 3)
+			# Imports and the database check come before the first heartbeat
+			timeout = self._heartbeat_timeout if self.ready.is_set() else self._startup_timeout
+			if time.monotonic() - self._last_seen > timeout:
+				logger.error(f"Worker {self.index} sent no heartbeat for {timeout:.0f}s, killing it")
+				self._process.kill()
+				return
+
+
+class WorkerPool:
+	"""Runs ``count`` worker processes and routes each update to one of them by chat id.
+
+	All updates of a chat go to the same worker, so its FSM state, throttling and
+	per-chat send pacing stay in one process.
+	"""
+
+	def __init__(self, count, command, base_env, queue_size=1000, heartbeat_timeout=15.0, startup_timeout=120.0):
+		self.workers = [
+			WorkerProcess(
+				index, command, worker_env(index, count, base_env),
+				queue_size=queue_size, heartbeat_timeout=heartbeat_timeout, startup_timeout=startup_timeout,
+			)
+			for index in range(count)
+		]
+
+	def start(self):
+		for worker in self.workers:
+			worker.start()
+
+	async def wait_ready(self, timeout):
+		"""Wait until every worker has sent a heartbeat; returns False if some did not within ``timeout``."""
+		try:
+			await asyncio.wait_for(asyncio.gather(*(worker.ready.wait() for worker in self.workers)), timeout)
+		except asyncio.TimeoutError:
+			return False
+		return True
+
+	async def stop(self):
+		await asyncio.gather(*(worker.stop() for worker in self.workers))
+
+	async def forward(self, update, shard_key):
+		worker = self.workers[shard_key % len(self.workers)]
+		await worker.queue.put(update.model_dump_json(exclude_unset=True).encode() + b"\n")
+		UPDATES_FORWARDED.labels(worker.index).inc()
+
+
+def build_receiver(pool):
+	"""A dispatcher without handlers that forwards every update to the pool."""
+	receiver = Dispatcher()
+
+	@receiver.update.outer_middleware()
+	async def forward(handler, update, data):
+		chat = data.get("event_chat")
+		user = data.get("event_from_user")
+		await pool.forward(update, chat.id if chat else user.id if user else 0)
+
+	return receiver
+
+
+async def run_worker(dp, bot, heartbeat_interval=2.0, max_in_flight=100):
+	"""Feed updates read from stdin to ``dp`` until stdin closes or SIGTERM, reporting liveness on stdout."""
+	loop = asyncio.get_running_loop()
+	reader = asyncio.StreamReader(limit=LINE_LIMIT)
+	await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+	stop = asyncio.Event()
+	for sig in (signal.SIGTERM, signal.SIGINT):
+		with suppress(NotImplementedError):
+			loop.add_signal_handler(sig, stop.set)
+
+	async def heartbeat():
+		while True:
+			sys.stdout.buffer.write(HEARTBEAT + b"\n")
+			sys.stdout.buffer.flush()
+			await asyncio.sleep(heartbeat_interval)
+
+	slots = asyncio.Semaphore(max_in_flight)
+	tasks = set()
+
+	async def process(update):
+		try:
+			await dp.feed_update(bot, update)
+		except Exception as e:
+			logger.error(f"Failed to process update {update.update_id}: {str(e)}")
+		finally:
+			slots.release()
+
+	beating = asyncio.create_task(heartbeat())
+	stopped = asyncio.create_task(stop.wait())
+	await dp.emit_startup(bot=bot, dispatcher=dp)
+	try:
+		while True:
+			reading = asyncio.create_task(reader.readline())
+			await asyncio.wait({reading, stopped}, return_when=asyncio.FIRST_COMPLETED)
+			if not reading.done():
+				reading.cancel()
+				break
+			line = reading.result()
+			if not line:
+				break
+			try:
+				update = Update.model_validate_json(line, context={"bot": bot})
+			except ValueError as e:
+				logger.warning(f"Skipped malformed update from the receiver: {str(e)}")
+				continue
+			await slots.acquire()
+			task = asyncio.create_task(process(update))
+			tasks.add(task)
+			task.add_done_callback(tasks.discard)
+	finally:
+		if tasks:
+			await asyncio.gather(*tasks, return_exceptions=True)
+		beating.cancel()
+		stopped.cancel()
+		try:
+			await dp.emit_shutdown(bot=bot, dispatcher=dp)
+		finally:
+			await bot.session.close()